@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import os
+import shutil
+import tempfile
+import gdspy
+import numpy as np
+from . import CellCache
+
+try:
+    import gdstk
+except ImportError:
+    gdstk = None
+
+"""Geometry backend of the qbdraw functions.
+The modules import 'gds' from here instead of gdspy. 'gds' forwards every attribute to gdspy, except the ones the
+selected backend replaces: with the 'gdstk' backend (C++ layout engine, optional) the boolean operations, the
+point-in-polygon tests and the GDS writer run in gdstk, while the cells, paths and references stay gdspy objects, so
+that the rest of the package (cache, instrumentation, assembly, DRC, ...) works unchanged with both backends.
+CheckConformance draws the same cells with both backends and compares their geometry."""
+
+_Settings = {'name': 'gdspy'}
+
+def _Polygons(operand):
+    '''List of point arrays of a gdspy boolean operand (polygons, paths, references, points or lists of them).'''
+    if operand is None:
+        return []
+    if isinstance(operand, gdspy.PolygonSet):
+        return list(operand.polygons)
+    if hasattr(operand, 'get_polygons'):
+        return operand.get_polygons()
+    polygons = []
+    for item in operand:
+        if isinstance(item, gdspy.PolygonSet):
+            polygons.extend(item.polygons)
+        elif hasattr(item, 'get_polygons'):
+            polygons.extend(item.get_polygons())
+        else:
+            polygons.append(np.asarray(item, dtype=float))
+    return polygons
+
+def _GdstkBoolean(operand1, operand2, operation, precision = 0.001, max_points = 199, layer = 0, datatype = 0):
+    '''gdspy.boolean computed by gdstk: a gdspy PolygonSet, None if the result is empty.'''
+    result = gdstk.boolean(_Polygons(operand1), _Polygons(operand2), operation, precision)
+    polygons = []
+    for polygon in result:
+        if max_points > 4 and len(polygon.points) > max_points:
+            polygons.extend(piece.points for piece in polygon.fracture(max_points, precision))
+        else:
+            polygons.append(polygon.points)
+    return gdspy.PolygonSet(polygons, layer=layer, datatype=datatype) if polygons else None
+
+def _GdstkInside(points, polygons, short_circuit = 'any', precision = 0.001):
+    '''gdspy.inside for single points (one result per point), computed by gdstk.'''
+    return gdstk.inside(np.asarray(points, dtype=float).reshape(-1, 2), _Polygons(polygons))
+
+#gdstk anchor of the (numeric) anchor of a gdspy label
+_Anchors = {0: 'nw', 1: 'n', 2: 'ne', 4: 'w', 5: 'o', 6: 'e', 8: 'sw', 9: 's', 10: 'se'}
+
+def GdstkCell(cell):
+    '''gdstk copy of a gdspy cell; the references point to the referenced cells by name.'''
+    converted = gdstk.Cell(cell.name)
+    for PolygonSet in cell.polygons:
+        converted.add(*[gdstk.Polygon(points, layer, datatype)
+                        for points, layer, datatype in zip(PolygonSet.polygons, PolygonSet.layers, PolygonSet.datatypes)])
+    for path in cell.paths:
+        for (layer, datatype), polygons in path.get_polygons(by_spec=True).items():
+            converted.add(*[gdstk.Polygon(points, layer, datatype) for points in polygons])
+    for label in cell.labels:
+        converted.add(gdstk.Label(label.text, tuple(label.position), _Anchors[label.anchor], np.deg2rad(label.rotation or 0),
+                                  label.magnification or 1, bool(label.x_reflection), label.layer, label.texttype))
+    for reference in cell.references:
+        name = reference.ref_cell if isinstance(reference.ref_cell, str) else reference.ref_cell.name
+        transform = dict(origin=tuple(reference.origin), rotation=np.deg2rad(reference.rotation or 0),
+                         magnification=reference.magnification or 1, x_reflection=bool(reference.x_reflection))
+        if isinstance(reference, gdspy.CellArray):
+            converted.add(gdstk.Reference(name, columns=reference.columns, rows=reference.rows, spacing=tuple(reference.spacing), **transform))
+        else:
+            converted.add(gdstk.Reference(name, **transform))
+    return converted
+
+class _GdstkWriter:
+    """gdspy.GdsWriter interface over gdstk.GdsWriter. A file object is written through a temporary file on close()."""
+    def __init__(self, outfile, name = 'library', unit = 1.0e-6, precision = 1.0e-9, timestamp = None):
+        self.outfile = outfile
+        if isinstance(outfile, (str, os.PathLike)):
+            self.path = outfile
+        else:
+            descriptor, self.path = tempfile.mkstemp(suffix='.gds')
+            os.close(descriptor)    #gdstk opens the file by its name
+        #gdspy only fractures the polygons above the GDSII limit when writing
+        self.writer = gdstk.GdsWriter(self.path, name, unit, precision, 8190, timestamp)
+    def write_cell(self, cell, timestamp = None):
+        self.writer.write(GdstkCell(cell))
+        return self
+    def close(self):
+        self.writer.close()
+        if self.path is not self.outfile:
+            with open(self.path, 'rb') as file:
+                shutil.copyfileobj(file, self.outfile)
+            os.remove(self.path)
+
+_Overrides = {'gdspy': {},
+              'gdstk': {'boolean': _GdstkBoolean, 'inside': _GdstkInside, 'GdsWriter': _GdstkWriter}}
+
+class _Proxy:
+    """Module-like object resolving gds.<name> in the selected backend at every access."""
+    def __getattr__(self, name):
+        override = _Overrides[_Settings['name']].get(name)
+        return getattr(gdspy, name) if override is None else override
+
+gds = _Proxy()
+
+def available_backends():
+    return ['gdspy']+(['gdstk'] if gdstk is not None else [])
+
+def set_backend(name):      #'gdspy' or 'gdstk'
+    '''Selects the backend of the following qbdraw calls and returns the previous one.'''
+    if name not in available_backends():
+        raise ValueError("Backend '"+str(name)+"' is not available, should be one of "+str(available_backends()))
+    previous = _Settings['name']
+    _Settings['name'] = name
+    return previous
+
+def get_backend():
+    return _Settings['name']
+
+CellCache.add_key_context(lambda: ('backend', _Settings['name']))
+
+def _ConformanceCells():
+    from . import qbdraw
+    from . import Negative as Neg
+    qubit = qbdraw.DrawFourJJqubit('ConformanceQubit')
+    GroundedQubit = qbdraw.DrawFourJJgroundedQubit('ConformanceGroundedQubit')
+    cells = {'resonator': qbdraw.DrawResonator('ConformanceResonator', num_meanders=3)[0],
+             'feedline': qbdraw.DrawReflectionFeedline('ConformanceFeedline')[0],
+             'qubit': qubit[0], 'qubit background': qubit[1],
+             'grounded qubit': GroundedQubit[0], 'grounded qubit background': GroundedQubit[1],
+             'bias line': qbdraw.DrawBiasLine('ConformanceBiasline')[0],
+             'label': qbdraw.DrawLabel('ConformanceLabel', 'Q1')[0]}
+    chip = gdspy.Cell('ConformanceChip', exclude_from_current=True)
+    chip.add([gdspy.CellReference(cells['feedline'], (0, 250)), gdspy.CellReference(cells['resonator'], (-800, 0)),
+              gdspy.CellReference(cells['qubit background'], (500, -900), rotation=90)])
+    cells['negative'] = Neg.DrawNegative(chip, [3000, 3000], 'ConformanceNegative', Tiles=(2,2), Processes=1)
+    return cells
+
+def _Difference(PolygonsA, PolygonsB, precision):
+    '''Area of the symmetric difference of two {(layer, datatype): [polygons]} dictionaries and area of the first one, per layer.'''
+    boolean = _GdstkBoolean if gdstk is not None else gdspy.boolean
+    areas = {}
+    for spec in set(PolygonsA) | set(PolygonsB):
+        difference = boolean(PolygonsA.get(spec, []), PolygonsB.get(spec, []), 'xor', precision=precision, max_points=0)
+        merged = boolean(PolygonsA.get(spec, []), None, 'or', precision=precision, max_points=0)
+        areas[spec] = (0.0 if difference is None else difference.area(), 0.0 if merged is None else merged.area())
+    return areas
+
+def CheckConformance(Backends = ('gdspy', 'gdstk'),
+                     tolerance = 1e-8,          #Maximal area of the per-layer difference, relative to the layer's area (rounding of the vertices)
+                     precision = 1e-3):
+    """
+    This function draws a set of qbdraw cells (and a tiled negative) with every backend, also writes and reads them back
+    as GDS, and compares them with the first backend's cells. It returns a list of the differences larger than
+    tolerance as (backend, cell, layer, area [um^2]) tuples: an empty list means the backends are geometrically identical.
+    """
+    previous = get_backend()
+    polygons = {}
+    try:
+        for backend in Backends:
+            set_backend(backend)
+            cells = _ConformanceCells()
+            polygons[backend] = {name: cell.get_polygons(by_spec=True) for name, cell in cells.items()}
+            directory = tempfile.mkdtemp()
+            try:
+                from . import qbdraw
+                FileName = os.path.join(directory, 'conformance')
+                qbdraw.saveCell2GDS(list(cells.values()), FileName)
+                library = gdspy.GdsLibrary(infile=FileName+'.gds')
+                for name, cell in cells.items():
+                    polygons[backend][name+' (gds)'] = library.cells[cell.name].get_polygons(by_spec=True)
+            finally:
+                shutil.rmtree(directory)
+    finally:
+        set_backend(previous)
+    differences = []
+    reference = polygons[Backends[0]]
+    for backend in Backends:
+        for name, cell in polygons[backend].items():
+            for spec, (difference, area) in _Difference(reference[name.replace(' (gds)', '')], cell, precision).items():
+                if difference > tolerance*max(area, 1):
+                    differences.append((backend, name, spec, difference))
+    return differences
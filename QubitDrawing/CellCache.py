@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import contextlib
+import functools
+import hashlib
+import inspect
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+"""Memoizing layer for the qbdraw Draw* cell generators.
+A call whose (canonicalized) parameters were already seen returns the cells built the first time instead of
+drawing them again. Cells are kept in a bounded LRU store, and a cell name that is requested again with different
+parameters gets a short parameter-hash suffix so that two different cells never share a name in the same GDS."""
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'currsize', 'maxsize'])
+
+_Cache = OrderedDict()      #key -> result of the Draw* function
+_CellNames = {}             #cell name -> key of the call that owns it (kept after eviction to avoid name reuse)
+_Stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+_Settings = {'enabled': True, 'maxsize': 512}
+_KeyContext = []            #Functions whose values are part of every key (e.g. the curve precision of qbdraw)
+
+def canonicalize(value, digits=9):
+    '''Turns a parameter value into a hashable, order-independent representation.
+    Floats (also numpy scalars) are rounded to 'digits' decimals so that 10 and 10.0 or float noise do not create new cells.'''
+    if isinstance(value, (bool, str, type(None))):
+        return value
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        value = round(float(value), digits)
+        return 0.0 if value == 0 else value  #-0.0 and 0.0 are the same cell
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), canonicalize(v, digits)) for k, v in value.items()))
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return tuple(canonicalize(v, digits) for v in value)
+    return repr(value)
+
+def KeyHash(key, length=8):
+    '''Short, stable (process independent) hexadecimal hash of a cache key.'''
+    return hashlib.sha1(repr(key).encode()).hexdigest()[:length]
+
+def memoize_cell(function):
+    """
+    Decorator for the Draw* functions.
+    The first parameter whose name ends with 'CellName' is treated as the cell name: it is part of the key,
+    and it is suffixed with the key hash if the same name was already used with different parameters.
+    The undecorated function stays available as 'function.__wrapped__' for callers that modify the returned cell.
+    """
+    signature = inspect.signature(function)
+    NameParameter = next((p for p in signature.parameters if p.endswith('CellName')), None)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _Settings['enabled']:
+            return function(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (function.__name__,) + tuple((p, canonicalize(v)) for p, v in bound.arguments.items()) + key_context()
+        if key in _Cache:
+            _Stats['hits'] += 1
+            _Cache.move_to_end(key)
+            return _Copy(_Cache[key])
+        _Stats['misses'] += 1
+        if NameParameter is not None:
+            name = bound.arguments[NameParameter]
+            owner = _CellNames.setdefault(name, key)
+            if owner != key:
+                name = name+'_'+KeyHash(key)
+                _CellNames[name] = key
+                bound.arguments[NameParameter] = name
+        result = function(*bound.args, **bound.kwargs)
+        _Cache[key] = result
+        while len(_Cache) > _Settings['maxsize']:
+            _Cache.popitem(last=False)
+            _Stats['evictions'] += 1
+        return _Copy(result)
+    return wrapper
+
+def add_key_context(function):
+    '''Adds a function without arguments whose (hashable) value becomes part of every cache key.'''
+    _KeyContext.append(function)
+
+def key_context():
+    '''Tuple with the current values of the key context functions.'''
+    return tuple(function() for function in _KeyContext)
+
+def _Copy(result):
+    '''Lists are returned as shallow copies so that the caller cannot change the cached entry (the cells are shared).'''
+    return list(result) if isinstance(result, list) else result
+
+@contextlib.contextmanager
+def isolated_cache():
+    '''Runs the block with an empty cache and no reserved cell names (as in a new process), then restores them.'''
+    saved = (_Cache.copy(), _CellNames.copy())
+    _Cache.clear()
+    _CellNames.clear()
+    try:
+        yield
+    finally:
+        _Cache.clear()
+        _Cache.update(saved[0])
+        _CellNames.clear()
+        _CellNames.update(saved[1])
+
+def cache_info():
+    '''Hit/miss statistics of the cell cache.'''
+    return CacheInfo(_Stats['hits'], _Stats['misses'], _Stats['evictions'], len(_Cache), _Settings['maxsize'])
+
+def cache_clear():
+    '''Forgets all cached cells, the reserved cell names and the statistics.'''
+    _Cache.clear()
+    _CellNames.clear()
+    for stat in _Stats:
+        _Stats[stat] = 0
+
+def set_cache(enabled = True,   #False makes every Draw* call build new cells, as without the cache
+              maxsize = None):  #Maximum number of cached calls (least recently used are evicted first)
+    '''Enables/disables the cell cache and sets its size.'''
+    _Settings['enabled'] = enabled
+    if maxsize is not None:
+        _Settings['maxsize'] = maxsize
+        while len(_Cache) > maxsize:
+            _Cache.popitem(last=False)
+            _Stats['evictions'] += 1
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import numpy as np
+from scipy import ndimage
+from .Backend import gds
+from .Instrumentation import instrument_cell, section
+from .PolygonStore import PolygonStore
+from .Render import LayerEdges, Rasterize
+
+"""Flux-trapping holes (cheesing) in the ground plane.
+The holes are the sites of a regular lattice over the chip. The circuit layers are rasterized once at a fraction of
+the lattice pitch (the filled pixels and the pixels along the polygon edges, for the lines thinner than a pixel), the
+raster is dilated by the keep-out distance (plus half a hole) with separable maximum filters, and a site keeps its
+hole if the dilated raster is empty there: no polygon boolean is computed. The kept sites are written as one hole
+cell and gds.CellArrays, one per rectangular block of identical runs of neighbouring sites in consecutive rows, so
+the GDS size grows with the number of blocks, not with the number of holes."""
+
+def _Pitch(Pitch):
+    return np.array([Pitch, Pitch] if np.isscalar(Pitch) else Pitch, dtype=float)
+
+def _Outline(store, spec, step):
+    '''Points along the polygon edges of a layer, at most step apart.'''
+    coords, offsets = store.Buffers(spec)
+    following = np.arange(len(coords))+1
+    following[offsets[1:]-1] = offsets[:-1]
+    start, end = coords, coords[following]
+    n = np.ceil(np.abs(end-start).max(axis=1)/step).astype(np.int64)+1
+    edge = np.repeat(np.arange(len(n)), n)
+    t = (np.arange(n.sum())-np.repeat(np.cumsum(n)-n, n))/np.maximum(n-1, 1)[edge]
+    return start[edge]+t[:,None]*(end[edge]-start[edge])
+
+def CheesingSites(Elements,                 #Top cell or a list of references/polygons with the circuit
+                  ChipSize,                 #[width, height], the chip is centered at the origin
+                  Pitch = 20,               #Lattice pitch, scalar or (x, y)
+                  HoleSize = 5,             #Side of the square holes
+                  KeepOut = 20,             #Minimal distance between the holes and the circuit
+                  EdgeMargin = 100,         #Minimal distance between the holes and the chip edge
+                  layers = [2, 5],          #Circuit layers the holes keep out of, all if None
+                  Oversampling = 2):        #Raster pixels per lattice pitch
+    """
+    This function returns a list with the boolean array [columns][rows] of the lattice sites that get a hole and the
+    position of the site (0, 0).
+    """
+    Pitch = _Pitch(Pitch)
+    ChipSize = np.asarray(ChipSize, dtype=float)
+    counts = np.maximum(np.floor((ChipSize-2*EdgeMargin-HoleSize)/Pitch).astype(int)+1, 0)
+    origin = -(counts-1)*Pitch/2                #The lattice is centered on the chip
+    if np.any(counts == 0):
+        return [np.zeros(counts, dtype=bool), origin]
+
+    #Raster of the circuit, the site (m, n) is in the pixels (m, n)*Oversampling ... (m, n)*Oversampling+Oversampling-1
+    pixel = Pitch/Oversampling
+    shape = counts*Oversampling
+    low = origin-Pitch/2
+    box = (tuple(low), tuple(low+shape*pixel))
+    store = Elements if isinstance(Elements, PolygonStore) else PolygonStore.FromElements(Elements, layers)
+    circuit = np.zeros(shape, dtype=bool)
+    for spec in store.Specs():
+        coords = store.Buffers(spec)[0]
+        if len(coords) == 0:
+            continue
+        circuit |= Rasterize(LayerEdges(store, spec), box, tuple(shape[::-1]))[::-1].T
+        index = np.floor((_Outline(store, spec, pixel.min()/2)-low)/pixel).astype(int)   #Lines thinner than a pixel
+        inside = np.all((index >= 0) & (index < shape), axis=1)
+        circuit[index[inside,0], index[inside,1]] = True
+
+    #Square (Chebyshev) dilation: a hole whose center is farther than KeepOut+HoleSize/2 in x or y keeps out of the circuit
+    reach = np.ceil((KeepOut+HoleSize/2)/pixel+1).astype(int)       #One pixel for the rasterization
+    blocked = ndimage.maximum_filter1d(circuit.view(np.uint8), 2*reach[0]+1, axis=0)
+    blocked = ndimage.maximum_filter1d(blocked, 2*reach[1]+1, axis=1)
+    offset = (Oversampling-1)//2
+    return [blocked[offset::Oversampling, offset::Oversampling] == 0, origin]
+
+def LatticeBlocks(sites):
+    """
+    List of the blocks (column, row, columns, rows) of a boolean site array [columns][rows]: the runs of neighbouring
+    sites of every row, merged with the identical runs of the following rows.
+    """
+    padded = np.zeros((sites.shape[0]+2, sites.shape[1]), dtype=np.int8)
+    padded[1:-1] = sites
+    changes = np.diff(padded, axis=0)
+    blocks, open_ = [], {}
+    for row in range(sites.shape[1]):
+        starts = np.flatnonzero(changes[:,row] == 1)
+        stops = np.flatnonzero(changes[:,row] == -1)
+        runs = set(zip(starts.tolist(), stops.tolist()))
+        for run in list(open_):
+            if run not in runs:
+                first = open_.pop(run)
+                blocks.append((run[0], first, run[1]-run[0], row-first))
+        for run in runs:
+            open_.setdefault(run, row)
+    for run, first in open_.items():
+        blocks.append((run[0], first, run[1]-run[0], sites.shape[1]-first))
+    return blocks
+
+@instrument_cell
+def DrawCheesing(Elements,                  #Top cell or a list of references/polygons with the circuit
+                 ChipSize,                  #[width, height], the chip is centered at the origin
+                 CheesingCellName = 'Cheesing',
+                 Pitch = 20,
+                 HoleSize = 5,
+                 KeepOut = 20,
+                 EdgeMargin = 100,
+                 layers = [2, 5],
+                 Oversampling = 2,
+                 layer = 1,                 #Holes layer (no metal), to be subtracted from the negative
+                 datatype = 0):
+    """
+    This function returns a list with the cheesing cell (references to one hole cell placed on the kept lattice sites,
+    see CheesingSites) and the number of holes.
+    """
+    Pitch = _Pitch(Pitch)
+    with section(CheesingCellName+' sites', 'raster'):
+        sites, origin = CheesingSites(Elements, ChipSize, Pitch, HoleSize, KeepOut, EdgeMargin, layers, Oversampling)
+    hole = gds.Cell(CheesingCellName+'Hole_%s_%d_%d' % (('%g' % HoleSize).replace('.', 'p'), layer, datatype), exclude_from_current=True)
+    hole.add(gds.Rectangle((-HoleSize/2, -HoleSize/2), (HoleSize/2, HoleSize/2), layer=layer, datatype=datatype))
+    Cheesing = gds.Cell(CheesingCellName, exclude_from_current=True)
+    for column, row, columns, rows in LatticeBlocks(sites):
+        position = tuple(origin+np.array([column, row])*Pitch)
+        if columns*rows == 1:
+            Cheesing.add(gds.CellReference(hole, origin=position))
+        else:
+            Cheesing.add(gds.CellArray(hole, columns, rows, tuple(Pitch), origin=position))
+    return [Cheesing, int(sites.sum())]
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import hashlib
+import os
+import gdspy as gds
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from . import qbdraw
+from . import SuppFunctions as SuppFun
+from . import CellCache
+
+"""Parallel chip assembly.
+Every site (resonator, qubit, bias line...) is drawn by its qbdraw function in a worker process. The worker sends back
+the cells as plain polygon arrays and references, the parent rebuilds them and places them in site order. Every site
+is drawn with an empty cell cache, as in a fresh worker, and a cell name taken by a different content always gets a
+suffix from its content digest, so the result (cell names included) does not depend on the number of processes."""
+
+def SerializeCell(cell, cells = None):
+    """
+    Adds the cell and all the cells it references to the dictionary 'cells' as
+    {name: {'polygons': {(layer, datatype): [arrays]}, 'references': [...], 'labels': [...], 'digest': str}}
+    and returns it. Only numpy arrays and python built-ins are used, so that it can be pickled cheaply.
+    The digest identifies the cell content (including the content of referenced cells).
+    """
+    if cells is None:
+        cells = {}
+    if cell.name in cells:
+        return cells
+    references = []
+    for reference in cell.references:
+        SerializeCell(reference.ref_cell, cells)
+        array = (reference.columns, reference.rows, tuple(reference.spacing)) if isinstance(reference, gds.CellArray) else None
+        references.append((reference.ref_cell.name, tuple(np.asarray(reference.origin, dtype=float)), reference.rotation,
+                           reference.magnification, bool(reference.x_reflection), array))
+    polygons = SuppFun.PolygonsByLayer(cell.polygons+cell.paths)
+    labels = [(label.text, tuple(label.position), label.anchor, label.rotation, label.magnification,
+               label.x_reflection, label.layer, label.texttype) for label in cell.labels]
+
+    digest = hashlib.sha1()
+    for spec in sorted(polygons):
+        digest.update(repr(spec).encode())
+        for p in polygons[spec]:
+            digest.update(np.round(p, 6).tobytes())
+    for reference in references:
+        digest.update(repr((cells[reference[0]]['digest'],)+reference[1:]).encode())
+    digest.update(repr(labels).encode())
+    cells[cell.name] = {'polygons': polygons, 'references': references, 'labels': labels, 'digest': digest.hexdigest()}
+    return cells
+
+def SerializeResult(result):
+    '''Replaces the cells in a Draw* result (a cell or a list) by their names and serializes them.'''
+    cells = {}
+    if isinstance(result, gds.Cell):
+        return SerializeCell(result, cells), ('cell', result.name)
+    if isinstance(result, (list, tuple)):
+        value = []
+        for item in result:
+            if isinstance(item, gds.Cell):
+                SerializeCell(item, cells)
+                value.append(('cell', item.name))
+            else:
+                value.append(('value', item))
+        return cells, value
+    return cells, ('value', result)
+
+def DeserializeResult(cells, value, registry):
+    """
+    Rebuilds the serialized cells and returns the Draw* result with the rebuilt cells in it.
+    'registry' {name: (digest, cell)} is shared between results: a cell with the same name and content is reused, and
+    a cell whose name was already taken by a different content gets a content-hash suffix.
+    """
+    names = {}
+    def build(name):
+        if name in names:
+            return names[name]
+        serialized = cells[name]
+        NewName = name
+        if name in registry and registry[name][0] != serialized['digest']:
+            NewName = name+'_'+serialized['digest'][:8]
+        if NewName in registry:
+            names[name] = registry[NewName][1]
+            return names[name]
+        cell = gds.Cell(NewName, exclude_from_current=True)
+        for (layer, datatype), polygons in serialized['polygons'].items():
+            cell.add(gds.PolygonSet(polygons, layer=layer, datatype=datatype))
+        for RefName, origin, rotation, magnification, x_reflection, array in serialized['references']:
+            if array is None:
+                cell.add(gds.CellReference(build(RefName), origin=origin, rotation=rotation,
+                                           magnification=magnification, x_reflection=x_reflection))
+            else:
+                cell.add(gds.CellArray(build(RefName), array[0], array[1], array[2], origin=origin, rotation=rotation,
+                                       magnification=magnification, x_reflection=x_reflection))
+        for text, position, anchor, rotation, magnification, x_reflection, layer, texttype in serialized['labels']:
+            cell.add(gds.Label(text, position, anchor=anchor, rotation=rotation, magnification=magnification,
+                               x_reflection=x_reflection, layer=layer, texttype=texttype))
+        registry[NewName] = (serialized['digest'], cell)
+        names[name] = cell
+        return cell
+
+    if isinstance(value, tuple):
+        return build(value[1]) if value[0] == 'cell' else value[1]
+    return [build(item) if kind == 'cell' else item for kind, item in value]
+
+def _BuildSite(site):
+    '''Draws one site with its qbdraw function. Runs in the worker processes (or in the parent if Processes is 1).'''
+    with CellCache.isolated_cache():
+        return SerializeResult(getattr(qbdraw, site['function'])(**site.get('parameters', {})))
+
+def _SiteReferences(site):
+    '''List of (index of the returned cell, origin, rotation, x_reflection) to place for a site.'''
+    if 'references' in site:
+        return [(r.get('cell', 0), r.get('origin', (0,0)), r.get('rotation', 0), r.get('x_reflection', False)) for r in site['references']]
+    return [(0, site.get('origin', (0,0)), site.get('rotation', 0), site.get('x_reflection', False))]
+
+def AssembleChip(Sites,                     #List of site dictionaries, see below
+                 TopCell = None,            #Cell in which the sites are placed, a new one named TopCellName if None
+                 TopCellName = 'TOP',
+                 Processes = None):         #Number of worker processes (None: one per core, 1: no pool)
+    """
+    This function draws all the sites in parallel and places them in the top cell, in the order of Sites.
+    Every site is a dictionary such as
+        {'function': 'DrawResonator', 'parameters': {'ResonatorCellName': 'Resonator_0', 'elongation': 200},
+         'origin': (x, y), 'rotation': 180}
+    or, to place several of the returned cells (e.g. a qubit and its background),
+        {'function': 'DrawFourJJqubit', 'parameters': {...},
+         'references': [{'cell': 0, 'origin': (x, y), 'rotation': 180}, {'cell': 1, 'origin': (x2, y2)}]}
+    It returns a list with the top cell, the Draw* results of the sites (with the rebuilt cells) and the lists of
+    references placed for every site.
+    """
+    if TopCell is None:
+        TopCell = gds.Cell(TopCellName, exclude_from_current=True)
+    if Processes == 1 or len(Sites) < 2:
+        serialized = [_BuildSite(site) for site in Sites]
+    else:
+        workers = Processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            serialized = list(pool.map(_BuildSite, Sites, chunksize=max(1, len(Sites)//(4*workers))))
+
+    registry = {}
+    results, references = [], []
+    for site, (cells, value) in zip(Sites, serialized):
+        result = DeserializeResult(cells, value, registry)
+        results.append(result)
+        SiteReferences = []
+        for index, origin, rotation, x_reflection in _SiteReferences(site):
+            cell = result[index] if isinstance(result, list) else result
+            SiteReferences.append(gds.CellReference(cell, origin=origin, rotation=rotation, x_reflection=x_reflection))
+            TopCell.add(SiteReferences[-1])
+        references.append(SiteReferences)
+    return [TopCell, results, references]
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import ast
+import hashlib
+import json
+import operator
+import gdspy as gds
+import numpy as np
+from . import qbdraw
+from . import Negative as Neg
+from . import SuppFunctions as SuppFun
+from .CellCache import canonicalize, KeyHash, key_context
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+"""Declarative chip description with incremental rebuilds.
+A chip spec is a dictionary (or a JSON/YAML file) such as
+    {'name': 'TOP', 'size': [5000, 5000],
+     'variables': {'FeedlinePos': 250, 'QubitY': '=FeedlinePos+1350'},
+     'components': {
+         'feedline': {'function': 'DrawReflectionFeedline', 'parameters': {'FeedlineCellName': 'ReflectionFeedline'},
+                      'origin': [0, '=FeedlinePos']},
+         'qubit_1': {'function': 'DrawFourJJqubit', 'parameters': {'FourJJqubitCellName': '4JJqubit_1'},
+                     'references': [{'cell': 0, 'origin': ["=-result('qubit_1')[2][0]", '=QubitY'], 'rotation': 180, 'negative': False},
+                                    {'cell': 1, 'origin': [0, '=QubitY'], 'rotation': 180, 'top': False}]},
+         'marks': {'function': 'CreateMarks', 'parameters': {'dx': 4700, 'dy': 4700}, 'references': [{'cell': 1, 'negative': False}]}},
+     'negative': {'tiles': [8, 8], 'layer': 0, 'precision': 1e-3, 'max_points': 199}}
+Every component is drawn by a qbdraw function and placed with one reference (origin/rotation/x_reflection) or a list of
+'references' to the returned cells. A reference is added to the top cell unless 'top' is False and subtracted from the
+wafer unless 'negative' is False.
+Strings starting with '=' are arithmetic expressions (numbers, + - * / // % **, subscripts, lists and tuples) of the
+variables, of the functions in _Functions and of result('component'), the Draw* result of another component, which
+makes the component depend on it: the component is redrawn when the other one is. No other python is evaluated.
+BuildChip keeps the previous build in its state: a component is only redrawn when its resolved parameters change, only
+re-placed when its references change, and only the negative tiles touched by the old or new polygons of the changed
+components are recomputed."""
+
+def LoadChipSpec(FileName):
+    '''Chip spec dictionary read from a JSON file, or from a YAML file (needs PyYAML).'''
+    with open(FileName) as file:
+        if FileName.lower().endswith('.json'):
+            return json.load(file)
+        if yaml is None:
+            raise ImportError('PyYAML is needed to read '+FileName)
+        return yaml.safe_load(file)
+
+_Operators = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+              ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+              ast.USub: operator.neg, ast.UAdd: operator.pos}
+_Functions = {'abs': abs, 'min': min, 'max': max, 'round': round, 'sqrt': np.sqrt, 'sin': np.sin, 'cos': np.cos, 'pi': np.pi}
+
+def _Expression(node, namespace):
+    '''Value of an expression node; only the nodes listed in the module docstring are allowed.'''
+    if isinstance(node, ast.Expression):
+        return _Expression(node.body, namespace)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool)):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id in namespace:
+            return namespace[node.id]
+        if node.id in _Functions:
+            return _Functions[node.id]
+        raise NameError("Unknown name '"+node.id+"' in a chip spec expression")
+    if isinstance(node, ast.BinOp) and type(node.op) in _Operators:
+        return _Operators[type(node.op)](_Expression(node.left, namespace), _Expression(node.right, namespace))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _Operators:
+        return _Operators[type(node.op)](_Expression(node.operand, namespace))
+    if isinstance(node, ast.Subscript):
+        return _Expression(node.value, namespace)[_Expression(node.slice, namespace)]
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_Expression(item, namespace) for item in node.elts]
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        function = _Expression(node.func, namespace)
+        if function is namespace.get('result') or function in _Functions.values():
+            return function(*[_Expression(argument, namespace) for argument in node.args])
+    raise ValueError('Not allowed in a chip spec expression: '+ast.dump(node))
+
+def _Evaluate(value, namespace):
+    '''Value with its '=' expressions evaluated (recursively in lists and dictionaries).'''
+    if isinstance(value, str) and value.startswith('='):
+        return _Expression(ast.parse(value[1:], mode='eval'), namespace)
+    if isinstance(value, dict):
+        return {k: _Evaluate(v, namespace) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_Evaluate(v, namespace) for v in value]
+    return value
+
+def _References(component):
+    '''List of reference dictionaries of a component (one reference to the first returned cell if none are given).'''
+    if 'references' in component:
+        return component['references']
+    return [{'cell': 0, 'origin': component.get('origin', [0,0]), 'rotation': component.get('rotation', 0),
+             'x_reflection': component.get('x_reflection', False), 'top': component.get('top', True),
+             'negative': component.get('negative', True)}]
+
+def _Place(name, result, placements):
+    '''References (to top, to negative) for the resolved placements of a component's result.'''
+    items = result if isinstance(result, (list, tuple)) else [result]
+    top, negative = [], []
+    for i, (index, origin, rotation, x_reflection, ToTop, ToNegative) in enumerate(placements):
+        item = items[index]
+        if not isinstance(item, gds.Cell): #e.g. the mark array of CreateMarks
+            item = gds.Cell(name+('_'+str(i) if i else ''), exclude_from_current=True).add(item)
+        reference = gds.CellReference(item, origin=origin, rotation=rotation, x_reflection=x_reflection)
+        if ToTop:
+            top.append(reference)
+        if ToNegative:
+            negative.append(reference)
+    return top, negative
+
+def _PolygonsDigest(polygons):
+    digest = hashlib.sha1()
+    for p in polygons:
+        digest.update(np.round(p, 6).tobytes())
+    return digest.hexdigest()
+
+def _Overlaps(tile, box):
+    return box is not None and box[0][0] < tile[2] and box[1][0] > tile[0] and box[0][1] < tile[3] and box[1][1] > tile[1]
+
+def BuildChip(Spec,                 #Chip spec dictionary, see above
+              State = None,         #State returned by the previous BuildChip call, to rebuild incrementally
+              Processes = 1):       #Worker processes for the negative tiles (None: one per core)
+    """
+    This function builds (or incrementally rebuilds) the chip described by the spec and returns a list with the top
+    cell and the new state. The state holds the components' results under state['results'] and, for the last build,
+    the names of the redrawn and re-placed components (state['redrawn'], state['replaced']) and the number of
+    recomputed negative tiles (state['tiles_recomputed']).
+    """
+    previous = State['components'] if State else {}
+    components = {}
+    variables = {}
+    for name, value in Spec.get('variables', {}).items():
+        variables[name] = _Evaluate(value, dict(variables))
+    redrawn, replaced = [], []
+
+    def build(name, visiting = ()):
+        if name in components:
+            return components[name]
+        if name in visiting:
+            raise ValueError('Circular dependency between components: '+' -> '.join(visiting+(name,)))
+        component = Spec['components'][name]
+        dependencies = []
+        def result(other):
+            dependencies.append(other)
+            return build(other, visiting+(name,))['result']
+        namespace = dict(variables, result=result)
+        function = component['function']
+        parameters = _Evaluate(component.get('parameters', {}), namespace)
+        #The keys of the components used in the parameters: a redrawn dependency redraws this component
+        DependencyKeys = tuple((other, components[other]['key']) for other in sorted(set(dependencies)))
+        key = KeyHash((function if isinstance(function, str) else function.__name__, canonicalize(parameters), key_context(),
+                       DependencyKeys), 16)
+        old = previous.get(name)
+        if old is not None and old['key'] == key:
+            Result = old['result']
+        else:
+            Result = (getattr(qbdraw, function) if isinstance(function, str) else function)(**parameters)
+            redrawn.append(name)
+        entry = {'key': key, 'result': Result}
+        components[name] = entry #The placements may refer to this component's own result
+        placements = []
+        for reference in _References(component):
+            reference = _Evaluate(reference, namespace)
+            placements.append((reference.get('cell', 0), tuple(float(x) for x in reference.get('origin', (0,0))),
+                               reference.get('rotation', 0), bool(reference.get('x_reflection', False)),
+                               reference.get('top', True), reference.get('negative', True)))
+        entry['placement'] = KeyHash((key, canonicalize(placements)), 16)
+        if old is not None and old['placement'] == entry['placement']:
+            entry.update((field, old[field]) for field in ('top', 'negative', 'layers', 'polygons', 'box', 'digest') if field in old)
+        else:
+            entry['top'], entry['negative'] = _Place(name, Result, placements)
+            replaced.append(name)
+        return entry
+
+    for name in Spec['components']:
+        build(name)
+
+    Top = gds.Cell(Spec.get('name', 'TOP'), exclude_from_current=True)
+    for name in Spec['components']:
+        Top.add(components[name]['top'])
+    state = {'components': components, 'results': {name: entry['result'] for name, entry in components.items()},
+             'redrawn': redrawn, 'replaced': replaced, 'tiles_recomputed': 0}
+
+    if 'negative' in Spec:
+        settings = dict({'tiles': [4,4], 'layers': None, 'layer': 0, 'datatype': 0, 'name': 'negative', 'precision': 1e-3,
+                         'max_points': 199, 'stitch': True}, **Spec['negative'])
+        layers = settings['layers']
+        for entry in components.values():
+            if 'digest' in entry and entry['layers'] == layers:
+                continue
+            entry['layers'] = layers
+            entry['polygons'] = [p for PolygonsList in SuppFun.PolygonsByLayer(entry['negative'], layers).values() for p in PolygonsList]
+            boxes = SuppFun.BoundingBoxes(entry['polygons'])
+            entry['box'] = (boxes[:,0].min(axis=0), boxes[:,1].max(axis=0)) if len(boxes) else None
+            entry['digest'] = _PolygonsDigest(entry['polygons'])
+        NegativeKey = KeyHash(canonicalize([Spec['size'], settings]))
+        OldNegative = State.get('negative') if State else None
+        changed = [name for name in set(components) | set(previous)
+                   if name not in components or name not in previous or components[name]['digest'] != previous[name].get('digest')]
+        DirtyBoxes = [entry[name].get('box') for name in changed for entry in (components, previous) if name in entry]
+
+        polygons = [p for name in Spec['components'] for p in components[name]['polygons']]
+        tiles, indices = Neg.NegativeTiles(polygons, Spec['size'], settings['tiles'])
+        if OldNegative is None or OldNegative['key'] != NegativeKey:
+            dirty = list(range(len(tiles)))
+            pieces = [[] for tile in tiles]
+        else:
+            dirty = [i for i, tile in enumerate(tiles) if any(_Overlaps(tile, box) for box in DirtyBoxes)]
+            pieces = list(OldNegative['pieces'])
+        jobs = [(tiles[i], [polygons[j] for j in indices[i]], settings['precision'], settings['max_points']) for i in dirty]
+        for i, TilePieces in zip(dirty, Neg.RunNegativeTiles(jobs, Processes)):
+            pieces[i] = TilePieces
+
+        if dirty or OldNegative is None:
+            NegativeCell = gds.Cell(settings['name'], exclude_from_current=True)
+            AllPieces = [piece for TilePieces in pieces for piece in TilePieces]
+            if settings['stitch']:
+                AllPieces = Neg.StitchTiles(AllPieces, tiles, settings['precision'], settings['max_points'])
+            if AllPieces:
+                NegativeCell.add(gds.PolygonSet(AllPieces, layer=settings['layer'], datatype=settings['datatype']))
+        else:
+            NegativeCell = OldNegative['cell']   #No tile changed, the stitched cell is still valid
+        Top.add(gds.CellReference(NegativeCell))
+        state['negative'] = {'key': NegativeKey, 'pieces': pieces, 'cell': NegativeCell}
+        state['tiles_recomputed'] = len(dirty)
+    return [Top, state]
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+from .Backend import gds
+import numpy as np
+from . import SuppFunctions as SuppFun
+from .PolygonStore import PolygonStore
+
+"""Design rule checks (minimum width, spacing and enclosure) over a built cell.
+Every checked layer is merged first, its polygons are oriented counterclockwise and split into edges. Edge pairs are
+only compared when their bounding boxes are closer than the rule distance, which a uniform grid finds
+(SuppFun.BoxPairs) without comparing all the pairs. The checks use the projection metric: two edges are compared if
+they face each other (anti-parallel for width and spacing, parallel for enclosure) and their projections overlap, so
+convex corners do not produce violations.
+Rules are dictionaries such as
+    {'name': 'circuit space', 'type': 'spacing', 'layer': 2, 'min': 1}
+    {'name': 'e-beam width', 'type': 'width', 'layer': 5, 'min': 0.05}
+    {'name': 'pads in plates', 'type': 'enclosure', 'layer': 5, 'outer': 2, 'min': 0.5}
+where layers are layer numbers or (layer, datatype)."""
+
+DefaultRules = [{'name': 'circuit width', 'type': 'width', 'layer': 2, 'min': 1},
+                {'name': 'circuit space', 'type': 'spacing', 'layer': 2, 'min': 1},
+                {'name': 'e-beam width', 'type': 'width', 'layer': 5, 'min': 0.05},
+                {'name': 'e-beam space', 'type': 'spacing', 'layer': 5, 'min': 0.1}]
+
+def MergedLayers(cell, specs, precision = 1e-3):
+    '''PolygonStore with the merged (boolean 'or', not fractured) polygons of the given layers of a cell.'''
+    polygons = SuppFun.PolygonsByLayer(cell)
+    merged = {}
+    for spec in specs:
+        spec = (spec, 0) if np.isscalar(spec) else tuple(spec)
+        if polygons.get(spec):
+            result = gds.boolean(polygons[spec], None, 'or', precision=precision, max_points=0)
+            merged[spec] = [] if result is None else result.polygons
+    return PolygonStore.FromPolygons(merged)
+
+def Edges(store, spec):
+    '''Arrays [E][2][2] with the edges (start, end) of a layer, oriented with the polygon interior on their left, and their polygon indices.'''
+    coords, offsets = store.Buffers(spec)
+    counts = np.diff(offsets)
+    polygon = np.repeat(np.arange(len(counts)), counts)
+    following = np.arange(len(coords))+1
+    following[offsets[1:]-1] = offsets[:-1]     #The last vertex connects to the first one
+    start, end = coords, coords[following]
+    area = np.add.reduceat(start[:,0]*end[:,1]-end[:,0]*start[:,1], offsets[:-1]) if len(counts) else np.zeros(0)
+    clockwise = area[polygon] < 0
+    start, end = np.where(clockwise[:,None], end, start), np.where(clockwise[:,None], start, end)
+    keep = np.any(start != end, axis=1)
+    return np.stack([start, end], axis=1)[keep], polygon[keep]
+
+def _Cross(a, b):
+    return a[:,0]*b[:,1]-a[:,1]*b[:,0]
+
+def SegmentDistances(A, B):
+    '''Minimal distances between the segments A[i] and B[i] (arrays [N][2][2]) and the middle points of the closest points.'''
+    def closest(P, S):
+        d = S[:,1]-S[:,0]
+        t = np.clip(np.einsum('ij,ij->i', P-S[:,0], d)/np.maximum(np.einsum('ij,ij->i', d, d), 1e-30), 0, 1)
+        return S[:,0]+t[:,None]*d
+    candidates = [(A[:,0], closest(A[:,0], B)), (A[:,1], closest(A[:,1], B)),
+                  (closest(B[:,0], A), B[:,0]), (closest(B[:,1], A), B[:,1])]
+    distances = np.stack([np.hypot(*(p-q).T) for p, q in candidates])
+    best = np.argmin(distances, axis=0)
+    p = np.choose(best[:,None], [c[0] for c in candidates])
+    q = np.choose(best[:,None], [c[1] for c in candidates])
+    return distances[best, np.arange(len(best))], (p+q)/2
+
+def _FacingPairs(EdgesA, EdgesB, pairs, Parallel, Side, tolerance):
+    """
+    Mask of the pairs (i, j) whose edges face each other: B[j] lies on side 'Side' (+1 left, -1 right) of A[i] and A[i]
+    on side Side (Parallel False) or -Side (Parallel True) of B[j], with overlapping projections.
+    """
+    A, B = EdgesA[pairs[:,0]], EdgesB[pairs[:,1]]
+    dA, dB = A[:,1]-A[:,0], B[:,1]-B[:,0]
+    direction = np.einsum('ij,ij->i', dA, dB)
+    LengthA, LengthB = np.hypot(*dA.T), np.hypot(*dB.T)
+    SideB = Side*np.minimum(_Cross(dA, B[:,0]-A[:,0]), _Cross(dA, B[:,1]-A[:,0]))/LengthA      #Signed distances of B to the line of A
+    SideA = (-Side if Parallel else Side)*np.minimum(_Cross(dB, A[:,0]-B[:,0]), _Cross(dB, A[:,1]-B[:,0]))/LengthB
+    tB = np.stack([np.einsum('ij,ij->i', B[:,k]-A[:,0], dA) for k in (0,1)])/LengthA**2
+    overlap = (np.minimum(tB.max(axis=0), 1)-np.maximum(tB.min(axis=0), 0))*LengthA
+    facing = (direction > 0) if Parallel else (direction < 0)
+    return facing & (SideB > tolerance) & (SideA > tolerance) & (overlap > tolerance)
+
+def _Violations(rule, EdgesA, EdgesB, pairs, tolerance):
+    distances, locations = SegmentDistances(EdgesA[pairs[:,0]], EdgesB[pairs[:,1]])
+    bad = distances < rule['min']-tolerance
+    return [{'rule': rule.get('name', rule['type']), 'type': rule['type'], 'layer': rule['layer'], 'min': rule['min'],
+             'value': float(d), 'location': tuple(float(x) for x in location),
+             'edges': (EdgesA[i].tolist(), EdgesB[j].tolist())}
+            for d, location, (i, j) in zip(distances[bad], locations[bad], pairs[bad])]
+
+def CheckRule(rule, store, tolerance = 5e-3):
+    '''List of the violations of one rule in a PolygonStore of merged layers (see MergedLayers).'''
+    edges, polygons = Edges(store, rule['layer'])
+    boxes = np.stack([edges.min(axis=1), edges.max(axis=1)], axis=1) if len(edges) else np.zeros((0,2,2))
+    if rule['type'] in ('width', 'spacing'):
+        pairs = SuppFun.BoxPairs(boxes, Distance=rule['min'])
+        pairs = pairs[_FacingPairs(edges, edges, pairs, False, 1 if rule['type'] == 'width' else -1, tolerance)]
+        if rule['type'] == 'width':
+            pairs = pairs[polygons[pairs[:,0]] == polygons[pairs[:,1]]]
+        return _Violations(rule, edges, edges, pairs, tolerance)
+    if rule['type'] == 'enclosure':
+        OuterEdges, OuterPolygons = Edges(store, rule['outer'])
+        OuterBoxes = np.stack([OuterEdges.min(axis=1), OuterEdges.max(axis=1)], axis=1) if len(OuterEdges) else np.zeros((0,2,2))
+        pairs = SuppFun.BoxPairs(boxes, OuterBoxes, Distance=rule['min'])
+        pairs = pairs[_FacingPairs(edges, OuterEdges, pairs, True, -1, -tolerance)]
+        violations = _Violations(rule, edges, OuterEdges, pairs, tolerance)
+        outer = store.Polygons(rule['outer'])
+        if len(edges):
+            inside = np.array(gds.inside(edges[:,0], outer)) if outer else np.zeros(len(edges), dtype=bool)
+            outside = np.flatnonzero(~inside)
+            for i in outside[np.unique(polygons[outside], return_index=True)[1]]: #One violation per polygon
+                violations.append({'rule': rule.get('name', rule['type']), 'type': 'not enclosed', 'layer': rule['layer'],
+                                   'min': rule['min'], 'value': -1.0, 'location': tuple(float(x) for x in edges[i,0]),
+                                   'edges': (edges[i].tolist(), None)})
+        return violations
+    raise ValueError("Unknown rule type '"+str(rule['type'])+"', should be 'width', 'spacing' or 'enclosure'")
+
+def CheckDesignRules(cell,                  #Cell to check, e.g. the Top cell of a chip
+                     Rules = DefaultRules,  #List of rule dictionaries, see above
+                     precision = 1e-3,
+                     tolerance = 5e-3):     #Distances within tolerance of the minimum are not violations
+    """
+    This function runs the rules over the cell and returns the list of violations as dictionaries with the 'rule'
+    name, 'type', 'layer', 'min', the measured 'value', the 'location' (middle of the closest points) and the two 'edges'.
+    """
+    specs = {rule[key] if np.isscalar(rule[key]) else tuple(rule[key]) for rule in Rules for key in ('layer', 'outer') if key in rule}
+    store = MergedLayers(cell, specs, precision)
+    return [violation for rule in Rules for violation in CheckRule(rule, store, tolerance)]
+
+def ViolationsCell(violations, CellName = 'DRC', layer = 63, size = 2):
+    '''Cell with a marker square (and the violating edges as paths) at every violation, to inspect them in a viewer.'''
+    cell = gds.Cell(CellName, exclude_from_current=True)
+    for violation in violations:
+        x, y = violation['location']
+        cell.add(gds.Rectangle((x-size/2, y-size/2), (x+size/2, y+size/2), layer=layer))
+        for edge in violation['edges']:
+            if edge is not None:
+                cell.add(gds.FlexPath(edge, size/10, layer=layer, datatype=1))
+        cell.add(gds.Label(violation['rule']+' '+'%.3g' % violation['value'], (x, y), layer=layer))
+    return cell
+
+def Summary(violations):
+    '''Dictionary {rule name: number of violations}.'''
+    counts = {}
+    for violation in violations:
+        counts[violation['rule']] = counts.get(violation['rule'], 0)+1
+    return counts
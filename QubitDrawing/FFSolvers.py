@@ -6,15 +6,39 @@ Created on Thu Mar 12 16:26:49 2020
 """
 
 import gdspy as gds
+import hashlib
 import os
+from collections import OrderedDict
 from PIL import Image
 import numpy as np
 import tripy
+try:
+    import mapbox_earcut
+except ImportError:
+    mapbox_earcut = None
+from . import SuppFunctions as SuppFun
 # import QubitDrawingFunctions as qbdraw
 
 """This module contains functions to simulate gds polygons in FastFieldSolvers apps and get inducatnce and capacirtance matrices using
 FastHenry and FasterCap, respectively.
-The 2D FasterCap function should not be used for chip geometry."""
+The 2D FasterCap function should not be used for chip geometry.
+The written files can be run (and their results parsed) with the SolverRunner module."""
+
+def _NewFileName(Name):
+    '''Name+number of the first file Name0.txt, Name1.txt, ... (up to 99) that does not exist yet.'''
+    c=0
+    while c<100:
+        FileName = Name+str(c)
+        if not os.path.exists(FileName+".txt"):
+            break
+        print("File "+FileName+" already exists, trying next number.")
+        c+=1
+    return FileName
+
+def CellPolygons(Cell, layer, datatype=None):
+    '''List with the polygons of a gdspy cell (or reference) in the given layer (and datatype, all if None).'''
+    return [polygon for (l, d), polygons in SuppFun.PolygonsByLayer(Cell, [layer]).items()
+            if datatype is None or d == datatype for polygon in polygons]
 
 def FastHenry(Name,
               Polygons=[], #List with polygons
@@ -22,61 +46,48 @@ def FastHenry(Name,
               LineWidth = 2,
               LineHeight = 0.1,
               WidthDiscretization= 7,
-              HeightDiscretization = 7):      
+              HeightDiscretization = 7,
+              Cell = None,      #gdspy cell to take the polygons from, instead of Polygons
+              layer = 2,        #Layer of the cell's polygons
+              datatype = None,  #Datatype of the cell's polygons, all if None
+              z = 0):           #z coordinate of all the nodes
     """
     This function recieves a list of 2D polygons (arrays-like[N][2]) and creates
     a text file that can be used to calculate an inductance matrix between
     objects using FastHenry.
+    Polygon P is written as nodes nQB_P_0 ... nQB_P_N (nQB_P_N repeats the first point) and
+    elements eQB_P_i between nodes nQB_P_i and nQB_P_i+1, so that '.external nQB_P_0 nQB_P_N' is the port of polygon P.
+    Returns the file name.
     """
+    if Cell is not None:
+        Polygons = CellPolygons(Cell, layer, datatype)
+    FileName = _NewFileName(Name)
     
-    '''Create and open file'''
-    #If file exists, try next number.
-    c=0
-    while c<100:
-        FileName = Name+str(c)
-        try:
-            with open(FileName+".txt") as file:
-                print("File "+FileName+" already exists, trying next number.")
-                c+=1
-        except IOError:
-            c=100
-    file = open(FileName+".txt", "a")
-    
-    '''Header: setting simulation chracteristics'''
-    file.write('**New Element - '+FileName+':\n\n')
-    file.write('* Default units \n \
-            .units ' +units+'\n')
-    file.write('* Default height, width and discretization\n \
-            .default nwinc='+str(WidthDiscretization)
-            +' nhinc='+str(HeightDiscretization)+' h='+str(LineHeight)
-            +' w='+str(LineWidth)+'\n')       
-    file.write('* Default units \n \
-            .units ' +units+'\n')
-    file.write('* Default height, width and discretization\n \
-            .default nwinc='+str(WidthDiscretization)
-            +' nhinc='+str(HeightDiscretization)+' h='+str(LineHeight)
-            +' w='+str(LineWidth)+'\n')
-    file.write('\n')
-    
-    '''Writing the cell's polygons in terms of nodes and elongations'''   
-    
-    for P,Polygon in enumerate(Polygons):
-        '''Polygon Nodes''' 
-        file.write('*Polygon'+str(P)+' Nodes:\n')
-        for i in range (len(Polygon)):
-            file.write('nQB_'+str(P)+'_'+str(i)+ ' '+str(Polygon[i][0])+' '+ str(Polygon[i][1])+'\n')
-        file.write('nQB'+str(i+1)+ ' '+str(Polygon[0][0])+' '+ str(Polygon[0][1])+'\n') #Repeat the first point of the polygon
-            
-        '''Polygon Elongations'''
-        file.write('*Polygon'+str(P)+' Elongations:\n')
-        for i in range (len(Polygon)):
-              file.write('eQB_'+str(P)+'_'+str(i)+ ' nQB'+str(i) +' nQB'+str(i+1)+'\n')
-        file.write('\n')
-    
-    '''Ender'''
-    file.write('\n.End \n \n')
-    file.close()
-    return
+    with open(FileName+".txt", "w", buffering=1<<20) as file:
+        '''Header: setting simulation chracteristics'''
+        file.write('**New Element - '+FileName+':\n\n'
+                   '* Default units\n.units '+units+'\n'
+                   '* Default height, width and discretization\n'
+                   '.default nwinc='+str(WidthDiscretization)+' nhinc='+str(HeightDiscretization)
+                   +' h='+str(LineHeight)+' w='+str(LineWidth)+'\n\n')
+        
+        '''Writing the cell's polygons in terms of nodes and elements, one write per polygon'''
+        for P,Polygon in enumerate(Polygons):
+            Polygon = np.asarray(Polygon, dtype=float)
+            n = len(Polygon)
+            index = np.arange(n+1)
+            Closed = np.vstack([Polygon, Polygon[:1]]) #Repeat the first point of the polygon
+            nodes = np.column_stack([index, Closed]).ravel().tolist()
+            elements = np.column_stack([index[:-1], index[:-1], index[1:]]).ravel().tolist()
+            file.write('*Polygon'+str(P)+' Nodes:\n'
+                       + ('nQB_'+str(P)+'_%d x=%.4f y=%.4f z='+str(z)+'\n')*(n+1) % tuple(nodes)
+                       + '*Polygon'+str(P)+' Elements:\n'
+                       + ('eQB_'+str(P)+'_%d nQB_'+str(P)+'_%d nQB_'+str(P)+'_%d\n')*n % tuple(elements)
+                       + '\n')
+        
+        '''Ender'''
+        file.write('\n.End \n \n')
+    return FileName+".txt"
 
 """
 FastHenry execution using this code.
@@ -137,107 +148,252 @@ The software 'GhostScript' should be downloaded and added to the system PATH in
 #     else:
 #         print('Please only type y or n')
 
+def _ConvexFan(Polygon, Holes):
+    '''Fan triangulation from the first vertex, only valid for convex polygons without holes.'''
+    if len(Holes):
+        raise ValueError("The 'fan' triangulation does not support holes, use 'earcut' (needs mapbox_earcut)")
+    Polygon = Polygon[np.abs(_Turns(Polygon)[0]) > 1e-12]   #Collinear (and repeated) vertices would give zero-area triangles
+    n = len(Polygon)
+    return np.stack([np.broadcast_to(Polygon[0], (n-2, 2)), Polygon[1:-1], Polygon[2:]], axis=1)
+
+def _Earcut(Polygon, Holes):
+    '''mapbox_earcut (C++ ear clipping with z-order hashing), supports holes.'''
+    rings = np.cumsum([len(Polygon)]+[len(hole) for hole in Holes]).astype(np.uint32)
+    points = np.concatenate([Polygon]+list(Holes))
+    return points[mapbox_earcut.triangulate_float64(points, rings).reshape(-1, 3)]
+
+def _Tripy(Polygon, Holes):
+    '''Pure python ear clipping (tripy), no holes.'''
+    if len(Holes):
+        raise ValueError("The 'tripy' triangulation does not support holes, install mapbox_earcut (optional dependency) to triangulate polygons with holes")
+    return np.array(tripy.earclip(Polygon), dtype=float).reshape(-1, 3, 2)
+
+TriangulationBackends = {'fan': _ConvexFan, 'earcut': _Earcut, 'tripy': _Tripy}
+TriangulationSettings = {'backend': 'auto',    #'auto': fan for convex polygons, otherwise earcut if installed, otherwise tripy (no holes)
+                         'maxsize': 4096}      #Number of triangulated shapes kept in the cache
+_TriangulationCache = OrderedDict()
+
+def _Turns(Polygon):
+    '''Cross and dot products of the edges before and after every vertex of the (N,2) polygon.'''
+    Polygon = np.asarray(Polygon, dtype=float)
+    before = Polygon-np.roll(Polygon, 1, axis=0)
+    after = np.roll(Polygon, -1, axis=0)-Polygon
+    return (before[:,0]*after[:,1]-before[:,1]*after[:,0]), (before*after).sum(axis=1)
+
+def IsConvex(Polygon):
+    '''True if all the turns along the (N,2) polygon have the same orientation and add up to one full turn (not a star).'''
+    cross, dot = _Turns(Polygon)
+    turning = cross[np.abs(cross) > 1e-12]
+    if len(turning) < 3 or not (np.all(turning > 0) or np.all(turning < 0)):
+        return False
+    return np.isclose(abs(np.arctan2(cross, dot).sum()), 2*np.pi)
+
+def Triangulate(Polygon, Holes=[], backend=None):
+    """
+    Array [M][3][2] of triangles covering the polygon (arrays-like[N][2]) without its holes.
+    Triangulations are cached by shape: the key is the polygon (and holes) relative to its first vertex, so identical
+    polygons at different positions (e.g. the capacitors of identical qubits) are triangulated once.
+    """
+    backend = backend or TriangulationSettings['backend']
+    Polygon = np.asarray(Polygon, dtype=float)
+    origin = Polygon[0]
+    Polygon = Polygon-origin
+    Holes = [np.asarray(hole, dtype=float)-origin for hole in Holes]
+    key = hashlib.sha1(repr((backend, len(Polygon), [len(hole) for hole in Holes])).encode()
+                       + np.round(np.concatenate([Polygon]+Holes), 6).tobytes()).hexdigest()
+    if key in _TriangulationCache:
+        _TriangulationCache.move_to_end(key)
+        return _TriangulationCache[key]+origin
+    
+    if backend == 'auto':
+        if not Holes and IsConvex(Polygon):
+            backend = 'fan'
+        else:
+            backend = 'earcut' if mapbox_earcut is not None else 'tripy'
+    triangles = TriangulationBackends[backend](Polygon, Holes)
+    _TriangulationCache[key] = triangles
+    while len(_TriangulationCache) > TriangulationSettings['maxsize']:
+        _TriangulationCache.popitem(last=False)
+    return triangles+origin
+
 def FasterCap(Name,
               Polygons=[], #List with polygons
-              PolygonsNames=[]):      
+              PolygonsNames=[],
+              backend=None): #Triangulation backend ('auto', 'fan', 'earcut', 'tripy'), TriangulationSettings['backend'] if None
     """
     This function recieves a list of 2D polygons (arrays-like[N][2]) and creates
     a text file that can be used to calculate an capacitance matrix between
     objects using FasterCap in its 3D mode.
+    Returns the file name.
     """
-    
-    '''Create and open file'''
-    #If file exists, try next number.
-    c=0
-    while c<100:
-        FileName = Name+'_FasterCap_'+str(c)
-        try:
-            with open(FileName+".txt") as file:
-                print("File "+FileName+" already exists, trying next number.")
-                file.close()
-                c+=1
-        except IOError:
-            c=100
-    file = open(FileName+".txt", "a")
-    
-    '''Header: setting simulation chracteristics'''
-    file.write('*0 '+FileName+'\n')
-    file.write('*Fast(er)Cap input file to calculate capacitance of polygon \n')
-    file.write('\n')
-            
-    '''Writing the cell's polygons in terms of triangles'''   
+    FileName = _NewFileName(Name+'_FasterCap_')
     if PolygonsNames ==[]:
-        for P in range(len(Polygons)):
-            PolygonsNames.append('Polygon'+str(P+1))            
-    for P,Polygon in enumerate(Polygons):
-        file.write('\n*G '+str(PolygonsNames[P])+'\t|3D coordinates of the three vertices of the triangle T patch\n\n')
-        triangles = tripy.earclip(Polygon)
-        for triangle in triangles:
-            file.write('T '+str(PolygonsNames[P])+'\t')
-            for vertex in range(3):
-                file.write(str(format(triangle[vertex][0],'.4f'))+'\t'+str(round(triangle[vertex][1],4))+'\t10.0\t') #10.0 is the default z coordinate
-            file.write('\n')
-            
-    return
+        PolygonsNames = ['Polygon'+str(P+1) for P in range(len(Polygons))]
+    
+    with open(FileName+".txt", "w", buffering=1<<20) as file:
+        '''Header: setting simulation chracteristics'''
+        file.write('*0 '+FileName+'\n')
+        file.write('*Fast(er)Cap input file to calculate capacitance of polygon \n')
+        file.write('\n')
+        
+        '''Writing the cell's polygons in terms of triangles'''
+        for P,Polygon in enumerate(Polygons):
+            triangles = Triangulate(Polygon, backend=backend)
+            file.write('\n*G '+str(PolygonsNames[P])+'\t|3D coordinates of the three vertices of the triangle T patch\n\n'
+                       + ('T '+str(PolygonsNames[P])+'\t'+'%.4f\t%.4f\t10.0\t'*3+'\n')*len(triangles) #10.0 is the default z coordinate
+                       % tuple(triangles.ravel().tolist()))
+    return FileName+".txt"
+
+def _DouglasPeucker(points, Tolerance):
+    '''Boolean mask of the points of an open chain kept by the Douglas-Peucker algorithm (end points always kept).'''
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0,-1]] = True
+    stack = [(0, len(points)-1)]
+    while stack:
+        first, last = stack.pop()
+        if last-first < 2:
+            continue
+        start, chord = points[first], points[last]-points[first]
+        inner = points[first+1:last]-start
+        length = np.hypot(*chord)
+        if length == 0:
+            deviation = np.hypot(inner[:,0], inner[:,1])
+        else:
+            deviation = np.abs(chord[0]*inner[:,1]-chord[1]*inner[:,0])/length
+        farthest = np.argmax(deviation)
+        if deviation[farthest] > Tolerance:
+            middle = first+1+farthest
+            keep[middle] = True
+            stack += [(first, middle), (middle, last)]
+    return keep
+
+def SimplifyPolygon(Polygon, Tolerance):
+    """
+    Removes the polygon's vertices that deviate less than Tolerance from the line between the kept vertices,
+    e.g. the dense, nearly collinear points of fillets and circular bends.
+    The closed polygon is split at its first vertex and at the vertex farthest from it, and both chains are
+    simplified with the Douglas-Peucker algorithm.
+    """
+    Polygon = np.asarray(Polygon, dtype=float)
+    if Tolerance <= 0 or len(Polygon) <= 3:
+        return Polygon
+    far = np.argmax(np.hypot(*(Polygon-Polygon[0]).T))
+    if far == 0:
+        return Polygon
+    keep = np.concatenate([_DouglasPeucker(Polygon[:far+1], Tolerance)[:-1],
+                           _DouglasPeucker(np.vstack([Polygon[far:], Polygon[:1]]), Tolerance)[:-1]])
+    return Polygon[keep] if keep.sum() >= 3 else Polygon
 
 def FasterCap2D(Name,
               Polygons=[],      #List with polygons
               PolygonsNames=[], #If not defined the polygons will be numbered
-              epsilon_e=[]):    #Relative (effective) permittivity outside the conductors      
+              epsilon_e=[],     #Relative (effective) permittivity outside the conductors
+              Tolerance=0):     #Maximal deviation of the simplified polygons from the original ones (no simplification if 0)
     """
     This function recieves a list of 2D polygons (arrays-like[N][2]) and creates
     a text file that can be used to calculate an capacitance matrix between
     objects using FasterCap using its 2D mode.
     The file consists the geometry files in the end and their references (and dielectric definitions) in the beginning.
+    If Tolerance is given the polygons are simplified first (see SimplifyPolygon) and the number of segments before
+    and after the simplification is printed.
+    Returns the file name.
     """
+    FileName = _NewFileName(Name+'_FasterCap_')
     
-    '''Create and open file'''
-    #If file exists, try next number.
-    c=0
-    while c<100:
-        FileName = Name+'_FasterCap_'+str(c)
-        try:
-            with open(FileName+".txt") as file:
-                print("File "+FileName+" already exists, trying next number.")
-                file.close()
-                c+=1
-        except IOError:
-            c=100
-    file = open(FileName+".txt", "a")
-    
-    ''''Numbering the polygons if no names were given'''
+    '''Numbering the polygons if no names were given'''
     if PolygonsNames ==[]:
-        for P in range(len(Polygons)):
-            PolygonsNames.append('Polygon'+str(P+1)) 
+        PolygonsNames = ['Polygon'+str(P+1) for P in range(len(Polygons))]
     
-    ''''Assuming air (relative permittivity =1) unless specifically givenvalues'''
+    '''Assuming air (relative permittivity =1) unless specifically givenvalues'''
     if epsilon_e ==[]:
-        for P in range(len(Polygons)):
-            epsilon_e.append(1.0) 
-            
-    '''Header and references to the geometry files'''
-    file.write('* 2D '+FileName+'\n')
-    file.write('* Fast(er)Cap 2D input file to calculate capacitance between polygons \n')
-    file.write('\n')
-    for P,Polygon in enumerate(Polygons):
-        file.write('C '+str(PolygonsNames[P])+'\t'+str(epsilon_e[P])+'\t0.0\t0.0\n')
+        epsilon_e = [1.0]*len(Polygons)
     
-    file.write('\nEnd\n\n***Start of the geometry files')
+    SegmentsBefore = sum(len(Polygon) for Polygon in Polygons)
+    Polygons = [SimplifyPolygon(Polygon, Tolerance) for Polygon in Polygons]
+    if Tolerance > 0:
+        print('Segments before simplification: '+str(SegmentsBefore)+', after: '+str(sum(len(Polygon) for Polygon in Polygons)))
     
-    '''Writing the cell's polygons in terms of segments in separate files'''              
+    with open(FileName+".txt", "w", buffering=1<<20) as file:
+        '''Header and references to the geometry files'''
+        file.write('* 2D '+FileName+'\n')
+        file.write('* Fast(er)Cap 2D input file to calculate capacitance between polygons \n')
+        file.write('\n')
+        for P,Polygon in enumerate(Polygons):
+            file.write('C '+str(PolygonsNames[P])+'\t'+str(epsilon_e[P])+'\t0.0\t0.0\n')
+        
+        file.write('\nEnd\n\n***Start of the geometry files')
+        
+        '''Writing the cell's polygons in terms of segments in separate files, including the segment between last and first points'''
+        for P,Polygon in enumerate(Polygons):
+            segments = np.column_stack([Polygon, np.roll(Polygon, -1, axis=0)])
+            file.write('\nFile '+str(PolygonsNames[P])+'\n'
+                       '\n*G '+str(PolygonsNames[P])+'\t|2D coordinates of the two points of the S segment\n\n'
+                       + ('S '+str(PolygonsNames[P])+'\t%.4f\t%.4f\t%.4f\t%.4f\n')*len(segments) % tuple(segments.ravel().tolist())
+                       + 'End\n')
+    return FileName+".txt"
+
+def _InsidePolygon(points, Polygon):
+    '''Boolean mask of the points (arrays-like[M][2]) inside the polygon (even-odd rule), vectorized over points and edges.'''
+    x, y = points[:,0][:,None], points[:,1][:,None]
+    x0, y0 = Polygon[:,0][None,:], Polygon[:,1][None,:]
+    x1, y1 = np.roll(Polygon[:,0], -1)[None,:], np.roll(Polygon[:,1], -1)[None,:]
+    crosses = (y0 > y) != (y1 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xcross = x0+(y-y0)*(x1-x0)/(y1-y0)
+    return np.count_nonzero(crosses & (x < xcross), axis=1) % 2 == 1
+
+def Panels(Polygons, PanelSize):
+    '''Centers of the square panels (side PanelSize) covering every polygon, and the index of the polygon of each panel.'''
+    centers, owners = [], []
     for P,Polygon in enumerate(Polygons):
-        file.write('\nFile '+str(PolygonsNames[P])+'\n')
-        file.write('\n*G '+str(PolygonsNames[P])+'\t|2D coordinates of the two points of the S segment\n\n')
-        for point_index in range(len(Polygon)-1):
-            file.write('S '+str(PolygonsNames[P])+'\t')
-            file.write(str(format(Polygon[point_index][0],'.4f'))+'\t'+str(format(Polygon[point_index][1],'.4f'))+'\t')
-            file.write(str(format(Polygon[point_index+1][0],'.4f'))+'\t'+str(format(Polygon[point_index+1][1],'.4f')))
-            file.write('\n')
-        #Add last segment between last and first points
-        file.write('S '+str(PolygonsNames[P])+'\t')
-        file.write(str(format(Polygon[-1][0],'.4f'))+'\t'+str(format(Polygon[-1][1],'.4f'))+'\t')
-        file.write(str(format(Polygon[0][0],'.4f'))+'\t'+str(format(Polygon[0][1],'.4f'))+'\n')
-        file.write('End\n')
-    return
+        Polygon = np.asarray(Polygon, dtype=float)
+        (xmin, ymin), (xmax, ymax) = Polygon.min(0), Polygon.max(0)
+        xs = np.arange(xmin+PanelSize/2, xmax, PanelSize)
+        ys = np.arange(ymin+PanelSize/2, ymax, PanelSize)
+        grid = np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+        inside = grid[_InsidePolygon(grid, Polygon)]
+        if len(inside) == 0:    #Polygon smaller than a panel
+            inside = Polygon.mean(0, keepdims=True)
+        centers.append(inside)
+        owners.append(np.full(len(inside), P))
+    return np.concatenate(centers), np.concatenate(owners)
+
+def CapacitanceMatrix(Polygons=[],          #List with polygons (arrays-like[N][2]), polygons with the same name are one conductor
+                      PolygonsNames=[],     #If not defined the polygons will be numbered
+                      epsilon_e=1.0,        #Relative permittivity around the conductors, (epsilon_r+1)/2 for conductors on a substrate
+                      Accuracy='coarse',    #'coarse' (~500 panels) or 'fine' (~3000 panels), or the panel size itself
+                      units=1e-6):          #[m], length unit of the polygons' coordinates
+    """
+    This function estimates the Maxwell capacitance matrix [F] between zero-thickness planar conductors in a
+    homogeneous medium, without an external solver. It receives the same polygons (and names) as FasterCap.
+    The conductors are cut into square panels with uniform charge (boundary element method with collocation at
+    the panel centers), and the panel charges are found for 1V on every conductor in turn.
+    Returns a list with the matrix and the conductor names (in the order of the matrix).
+    """
+    if PolygonsNames ==[]:
+        PolygonsNames = ['Polygon'+str(P+1) for P in range(len(Polygons))]
+    names = list(dict.fromkeys(PolygonsNames))
+    conductor = np.array([names.index(name) for name in PolygonsNames])
+    
+    if isinstance(Accuracy, str):
+        TotalArea = sum(abs(gds.PolygonSet([Polygon]).area()) for Polygon in Polygons)
+        PanelSize = np.sqrt(TotalArea/{'coarse': 500, 'fine': 3000}[Accuracy])
+    else:
+        PanelSize = Accuracy
+    centers, owners = Panels(Polygons, PanelSize)
+    owners = conductor[owners]
+    
+    '''Potential coefficients: point charges between panels, uniformly charged square for the panel itself'''
+    epsilon = 8.8541878128e-12*epsilon_e
+    distances = np.hypot(centers[:,None,0]-centers[None,:,0], centers[:,None,1]-centers[None,:,1])*units
+    np.fill_diagonal(distances, 1)
+    G = 1/distances
+    np.fill_diagonal(G, 4*np.log(1+np.sqrt(2))/(PanelSize*units))
+    G /= 4*np.pi*epsilon
+    
+    Excitations = (owners[:,None] == np.arange(len(names))[None,:]).astype(float)
+    Charges = np.linalg.solve(G, Excitations)
+    C = Excitations.T@Charges
+    return [(C+C.T)/2, names]
 
 # FasterCap(Name = 'TRY', Polygons=[[[0.0,1.0],[1.0,1.0],[1.0,0.0],[0.0,0.0]]])
\ No newline at end of file
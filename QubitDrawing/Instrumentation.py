@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import gdspy as gds
+from . import SuppFunctions as SuppFun
+
+"""Opt-in build instrumentation for qbdraw.
+While it is enabled, every instrumented Draw* call and every named section (the gds.boolean calls of the qubits, the
+tiles of the negative...) is recorded with its wall time, the cells it created, the polygons and vertices it added
+per layer and its memory delta. The records can be printed as a table or exported as a Chrome trace
+(chrome://tracing or https://ui.perfetto.dev). When it is disabled the instrumented functions only pay one dictionary
+lookup. Memory deltas (tracemalloc) are opt-in, since tracing slows the gdspy path code down a lot.
+    with Instrumentation.instrument() as records:
+        ...build the chip...
+    Instrumentation.print_report()
+    Instrumentation.export_chrome_trace('build_trace.json')"""
+
+LayerNames = {2: 'circuit', 5: 'e-beam', 0: 'negative'}
+
+_Settings = {'enabled': False, 'memory': False}
+_Records = []                   #One dictionary per finished call/section, in order of completion
+_Stack = threading.local()      #Open calls/sections of the current thread
+_SeenCells = {}                 #id -> cell already attributed to a call (kept until clear())
+_Origin = [time.perf_counter()]
+
+def enable(memory = False):     #If True, memory deltas are measured with tracemalloc (the gdspy paths get much slower)
+    '''Starts recording (the previous records are kept).'''
+    _Settings['enabled'] = True
+    _Settings['memory'] = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable():
+    '''Stops recording and tracemalloc (if it was started here).'''
+    if _Settings['enabled'] and _Settings['memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _Settings['enabled'] = False
+
+def clear():
+    '''Forgets the records.'''
+    _Records.clear()
+    _SeenCells.clear()
+    _Origin[0] = time.perf_counter()
+
+def records():
+    '''List of the records, see _Record.'''
+    return list(_Records)
+
+@contextlib.contextmanager
+def instrument(memory = False):
+    '''Context manager that clears the records, enables the instrumentation and yields the (live) list of records.'''
+    clear()
+    enable(memory)
+    try:
+        yield _Records
+    finally:
+        disable()
+
+def _Memory():
+    return tracemalloc.get_traced_memory()[0] if _Settings['memory'] and tracemalloc.is_tracing() else 0
+
+def _NewCells(result):
+    '''Cells in a Draw* result (and their dependencies) that were not attributed to an earlier call.'''
+    items = result if isinstance(result, (list, tuple)) else [result]
+    cells = []
+    for item in items:
+        if isinstance(item, gds.Cell):
+            for cell in [item]+list(item.get_dependencies(True)):
+                if id(cell) not in _SeenCells and cell not in cells:
+                    cells.append(cell)
+    return cells
+
+def _Record(name, kind, start, end, memory, result = None):
+    """
+    Stores a record {'name', 'kind', 'start', 'duration' [s], 'self' [s, without the nested records], 'depth', 'thread',
+    'memory' [B, traced memory delta], 'cells' [names of the created cells], 'layers' {layer: [polygons, vertices]}}.
+    Only the polygons directly in the created cells count, so nested calls are not counted twice. The time spent here
+    counting them is excluded from the durations of the enclosing records.
+    """
+    memory = _Memory()-memory
+    stack = _Stack.frames
+    frame = stack.pop()
+    cells = _NewCells(result) if result is not None else []
+    layers = {}
+    for cell in cells:
+        _SeenCells[id(cell)] = cell
+        for (layer, datatype), (polygons, vertices) in SuppFun.PolygonStatistics(cell.polygons+cell.paths).items():
+            counts = layers.setdefault(layer, [0, 0])
+            counts[0] += polygons
+            counts[1] += vertices
+    duration = end-start-frame['overhead']
+    if stack:
+        stack[-1]['nested'] += duration
+        stack[-1]['overhead'] += frame['overhead']+time.perf_counter()-end
+    _Records.append({'name': name, 'kind': kind, 'start': start-_Origin[0], 'duration': duration,
+                     'self': duration-frame['nested'], 'depth': len(stack), 'thread': threading.get_ident(),
+                     'memory': memory, 'cells': [cell.name for cell in cells], 'layers': layers})
+
+def _Open():
+    if not hasattr(_Stack, 'frames'):
+        _Stack.frames = []
+    _Stack.frames.append({'nested': 0.0, 'overhead': 0.0})
+
+@contextlib.contextmanager
+def section(name,               #Name of the record
+            kind = 'section',   #Category, e.g. 'boolean'
+            result = None):     #Optional list; the cells appended to it are attributed to the section
+    '''Records the enclosed block, e.g. with Instrumentation.section('4JJqubit boolean', 'boolean'): ...'''
+    if not _Settings['enabled']:
+        yield
+        return
+    _Open()
+    memory = _Memory()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _Record(name, kind, start, time.perf_counter(), memory, result)
+
+def instrument_cell(function):
+    """
+    Decorator for the Draw* functions. The record is named after the function and the cell name parameter (the first
+    parameter ending with 'CellName'), if any. It is placed below @memoize_cell, so only the calls that really draw
+    are recorded.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _Settings['enabled']:
+            return function(*args, **kwargs)
+        name = next((str(v) for k, v in kwargs.items() if k.endswith('CellName')), None)
+        if name is None and args and isinstance(args[0], str):
+            name = args[0]
+        _Open()
+        memory = _Memory()
+        start = time.perf_counter()
+        result = None
+        try:
+            result = function(*args, **kwargs)
+            return result
+        finally:
+            _Record(function.__name__+('('+name+')' if name else ''), 'generator', start, time.perf_counter(), memory, result)
+    return wrapper
+
+def summary(Records = None):    #Records to summarize, all if None
+    '''Dictionary {function or section name without the cell name: totals of calls, time, self time, cells, memory and layers}.'''
+    totals = {}
+    for record in (_Records if Records is None else Records):
+        key = record['name'].split('(')[0]
+        total = totals.setdefault(key, {'kind': record['kind'], 'calls': 0, 'time': 0.0, 'self': 0.0, 'cells': 0, 'memory': 0, 'layers': {}})
+        total['calls'] += 1
+        total['time'] += record['duration']
+        total['self'] += record['self']
+        total['cells'] += len(record['cells'])
+        total['memory'] += record['memory']
+        for layer, (polygons, vertices) in record['layers'].items():
+            counts = total['layers'].setdefault(layer, [0, 0])
+            counts[0] += polygons
+            counts[1] += vertices
+    return totals
+
+def report(Records = None, sort = 'self', layers = (2, 5, 0)):
+    '''Text table of the summary, sorted by 'self' time (or any other numeric column), with polygons/vertices of the given layers.'''
+    totals = summary(Records)
+    columns = ''.join(' %18s' % (LayerNames.get(layer, 'layer '+str(layer))+' pol/vert') for layer in layers)
+    lines = ['%-28s %-10s %6s %10s %10s %6s %10s' % ('name', 'kind', 'calls', 'time [s]', 'self [s]', 'cells', 'mem [kB]')+columns]
+    for name, total in sorted(totals.items(), key=lambda item: -item[1][sort]):
+        counts = ''.join(' %18s' % ('%d/%d' % tuple(total['layers'].get(layer, [0, 0]))) for layer in layers)
+        lines.append('%-28s %-10s %6d %10.4f %10.4f %6d %10.1f' % (name[:28], total['kind'], total['calls'], total['time'],
+                                                                   total['self'], total['cells'], total['memory']/1024)+counts)
+    return '\n'.join(lines)
+
+def print_report(Records = None, sort = 'self', layers = (2, 5, 0)):
+    print(report(Records, sort, layers))
+
+def export_table(FileName, Records = None):
+    '''Writes one CSV line per record (name, kind, start, duration, self, depth, memory, cells, polygons and vertices per layer).'''
+    Records = _Records if Records is None else Records
+    layers = sorted({layer for record in Records for layer in record['layers']})
+    with open(FileName, 'w') as file:
+        file.write(','.join(['name', 'kind', 'start', 'duration', 'self', 'depth', 'memory', 'cells']+
+                            ['L%d_%s' % (layer, what) for layer in layers for what in ('polygons', 'vertices')])+'\n')
+        for record in Records:
+            counts = [str(n) for layer in layers for n in record['layers'].get(layer, [0, 0])]
+            file.write(','.join(['"'+record['name']+'"', record['kind'], '%.6f' % record['start'], '%.6f' % record['duration'],
+                                 '%.6f' % record['self'], str(record['depth']), str(record['memory']), str(len(record['cells']))]+counts)+'\n')
+    return FileName
+
+def export_chrome_trace(FileName, Records = None):
+    '''Writes the records in the Chrome trace event format (complete events, times in microseconds).'''
+    events = [{'name': record['name'], 'cat': record['kind'], 'ph': 'X', 'ts': record['start']*1e6, 'dur': record['duration']*1e6,
+               'pid': os.getpid(), 'tid': record['thread'],
+               'args': {'cells': record['cells'], 'memory': record['memory'],
+                        'layers': {LayerNames.get(layer, str(layer)): counts for layer, counts in record['layers'].items()}}}
+              for record in (_Records if Records is None else Records)]
+    with open(FileName, 'w') as file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+    return FileName
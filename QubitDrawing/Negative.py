@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+from .Backend import gds
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from . import SuppFunctions as SuppFun
+from .Instrumentation import instrument_cell, section
+
+"""Tiled generation of the chip's negative (wafer minus circuit) layer.
+The chip is split into tiles, every tile only gets the polygons whose bounding boxes intersect it and the tiles'
+boolean operations run in separate processes. The pieces are then stitched tile side by tile side (an 'or' of the
+few pieces touching each inner side) so that no seam is left at the tile borders."""
+
+def _NegativeTile(job):
+    '''Wafer tile minus the circuit polygons that touch it. Runs in the worker processes.'''
+    (x0, y0, x1, y1), polygons, precision, max_points = job
+    tile = gds.Rectangle((x0, y0), (x1, y1))
+    if len(polygons) == 0:
+        return tile.polygons
+    result = gds.boolean(tile, polygons, 'not', precision=precision, max_points=max_points)
+    return [] if result is None else result.polygons
+
+def NegativeTiles(polygons,             #List of circuit polygons (arrays-like[N][2])
+                  ChipSize,             #[width, height], the chip is centered at the origin
+                  Tiles = (4,4),        #Number of tiles in x and y
+                  boxes = None):        #Bounding boxes of the polygons, computed if not given
+    '''List of the tiles (x0, y0, x1, y1) and, for each tile, the indices of the polygons intersecting it.'''
+    if boxes is None:
+        boxes = SuppFun.BoundingBoxes(polygons)
+    xs = np.linspace(-ChipSize[0]/2, ChipSize[0]/2, Tiles[0]+1)
+    ys = np.linspace(-ChipSize[1]/2, ChipSize[1]/2, Tiles[1]+1)
+    tiles, indices = [], []
+    for i in range(Tiles[0]):
+        for j in range(Tiles[1]):
+            touching = (boxes[:,0,0] < xs[i+1]) & (boxes[:,1,0] > xs[i]) & (boxes[:,0,1] < ys[j+1]) & (boxes[:,1,1] > ys[j])
+            tiles.append((xs[i], ys[j], xs[i+1], ys[j+1]))
+            indices.append(np.flatnonzero(touching))
+    return tiles, indices
+
+def RunNegativeTiles(jobs, Processes = None):
+    '''Runs _NegativeTile on every job, in a process pool unless Processes is 1, and returns the results in order.'''
+    if Processes == 1 or len(jobs) < 2:
+        return [_NegativeTile(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=Processes) as pool:
+        return list(pool.map(_NegativeTile, jobs))
+
+def StitchTiles(pieces,             #List of the pieces (point arrays) of all the tiles
+                tiles,              #Tiles (x0, y0, x1, y1) from NegativeTiles
+                precision = 1e-3,
+                max_points = 199):
+    """
+    List of the pieces merged across the inner tile borders (and fractured to max_points). The borders are stitched
+    one tile side at a time: only the pieces touching that side are merged, so every boolean stays small.
+    """
+    pieces = list(pieces)
+    if len(pieces) == 0:
+        return pieces
+    tiles = np.asarray(tiles, dtype=float)
+    low, high = tiles[:,:2].min(axis=0), tiles[:,2:].max(axis=0)
+    #Inner tile sides as (axis, position, start, end): the sides at x = position (axis 0) or y = position (axis 1)
+    sides = {(0, x1, y0, y1) for x0, y0, x1, y1 in tiles if x1 < high[0]} | {(1, y1, x0, x1) for x0, y0, x1, y1 in tiles if y1 < high[1]}
+    boxes = SuppFun.BoundingBoxes(pieces)
+    alive = np.ones(len(pieces), dtype=bool)
+    for axis, position, start, end in sorted(sides):
+        other = 1-axis
+        touching = np.flatnonzero(alive & (boxes[:,0,axis] <= position+precision) & (boxes[:,1,axis] >= position-precision)
+                                  & (boxes[:,0,other] < end) & (boxes[:,1,other] > start))
+        if len(touching) < 2:
+            continue
+        merged = gds.boolean([pieces[i] for i in touching], None, 'or', precision=precision, max_points=max_points)
+        alive[touching] = False
+        if merged is not None:
+            pieces += merged.polygons
+            boxes = np.concatenate([boxes, SuppFun.BoundingBoxes(merged.polygons)])
+            alive = np.concatenate([alive, np.ones(len(merged.polygons), dtype=bool)])
+    return [piece for piece, keep in zip(pieces, alive) if keep]
+
+@instrument_cell
+def DrawNegative(Elements,                      #Top cell or a list of references/polygons to subtract from the wafer
+                 ChipSize,                      #[width, height], the wafer rectangle is centered at the origin
+                 NegativeCellName = 'negative',
+                 layers = None,                 #Only subtract these layers of Elements (e.g. [2] for the Top cell), all if None
+                 Tiles = (4,4),                 #Number of tiles in x and y
+                 Processes = None,              #Number of worker processes (None: one per core, 1: no pool)
+                 layer = 0,                     #Layer of the negative
+                 datatype = 0,
+                 precision = 1e-3,
+                 max_points = 199,
+                 Stitch = True):                #Merge the pieces across the tile borders (see StitchTiles)
+    """
+    This function returns the negative cell, i.e. the wafer rectangle without the circuit, built tile by tile.
+    It replaces gds.boolean(wafer, [FeedlineReference]+..., 'not'): the same list of references can be given,
+    or the Top cell together with the circuit layers.
+    """
+    polygons = [p for PolygonsList in SuppFun.PolygonsByLayer(Elements, layers).values() for p in PolygonsList]
+    tiles, indices = NegativeTiles(polygons, ChipSize, Tiles)
+    jobs = [(tile, [polygons[i] for i in index], precision, max_points) for tile, index in zip(tiles, indices)]
+    
+    Negative = gds.Cell(NegativeCellName, exclude_from_current=True)
+    with section(NegativeCellName+' tiles', 'boolean'):
+        pieces = [piece for TilePieces in RunNegativeTiles(jobs, Processes) for piece in TilePieces]
+    if Stitch:
+        with section(NegativeCellName+' stitch', 'boolean'):
+            pieces = StitchTiles(pieces, tiles, precision, max_points)
+    if pieces:
+        Negative.add(gds.PolygonSet(pieces, layer=layer, datatype=datatype))
+    return Negative
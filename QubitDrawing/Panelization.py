@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+from .Backend import gds
+import numpy as np
+from . import ChipAssembly
+
+"""Wafer panelization.
+The dies are placed on a regular grid inside the wafer circle and every die only references its chip design: each
+unique design is stored once, identical designs (same geometry, even in different cell objects) are merged, and
+neighbouring dies of the same design in a row become one gds.CellArray. The GDS size and the memory therefore grow
+with the number of unique designs and of design changes along the rows, not with the number of dies."""
+
+def DieSites(WaferDiameter = 100000,    #[um]
+             ChipSize = (5000,5000),
+             DicingLane = 100,          #Width of the lanes between the dies
+             EdgeExclusion = 3000,      #Margin from the wafer edge without dies
+             Offset = (0,0)):           #Shift of the die grid with respect to the wafer center
+    """
+    This function returns the list of die sites (column, row, (x, y) die center) whose dies lie completely inside the
+    usable wafer circle, ordered row by row from the top, and the grid pitch.
+    """
+    pitch = np.array(ChipSize, dtype=float)+DicingLane
+    radius = WaferDiameter/2-EdgeExclusion
+    n = np.ceil(radius/pitch).astype(int)
+    sites = []
+    for row in range(n[1], -n[1]-1, -1):
+        for column in range(-n[0], n[0]+1):
+            center = np.array([column, row])*pitch+Offset
+            corners = center+np.array([[-1,-1],[-1,1],[1,-1],[1,1]])*np.array(ChipSize)/2
+            if np.all(np.hypot(corners[:,0], corners[:,1]) <= radius):
+                sites.append((column, row, tuple(center)))
+    return sites, pitch
+
+def UniqueDesigns(Chips):
+    """
+    Returns the list of unique chip cells and, for every chip, the index of its unique design. Chips with the same
+    geometry (ChipAssembly.SerializeCell digest) share a design. If different designs use the same cell name for different
+    content, the designs are rebuilt with content-hash suffixed names (as in ChipAssembly) so that the GDS stays valid.
+    """
+    serialized, digests = [], []
+    for chip in Chips:
+        cells = ChipAssembly.SerializeCell(chip, {})
+        serialized.append(cells)
+        digests.append(cells[chip.name]['digest'])
+    unique = list(dict.fromkeys(digests))
+    indices = [unique.index(digest) for digest in digests]
+    first = [digests.index(digest) for digest in unique]
+
+    owners = {}
+    clash = False
+    for i in first:
+        for name, cell in serialized[i].items():
+            clash = clash or owners.setdefault(name, cell['digest']) != cell['digest']
+    if not clash:
+        return [Chips[i] for i in first], indices
+    registry = {}
+    return [ChipAssembly.DeserializeResult(serialized[i], ('cell', Chips[i].name), registry) for i in first], indices
+
+def PanelizeWafer(Chips,                        #List of chip (top) cells
+                  Counts = None,                #Number of dies of every chip, the chips are repeated in turn over all the sites if None
+                  WaferDiameter = 100000,       #[um]
+                  ChipSize = (5000,5000),
+                  DicingLane = 100,
+                  EdgeExclusion = 3000,
+                  Offset = (0,0),
+                  WaferCellName = 'WAFER',
+                  DicingLayer = 3,              #Layer of the dicing lanes (None: no lanes)
+                  OutlineLayer = 4,             #Layer of the wafer outline ring (None: no outline)
+                  OutlineWidth = 100):
+    """
+    This function lays the chips out on a wafer and returns a list with the wafer cell and the sites as dictionaries
+    {'column', 'row', 'center', 'design'} ('design' indexes the returned unique designs, the third item of the list).
+    The chip cells are centered at their origin (as the qbdraw chips, whose marks and negative are centered).
+    Dicing lanes are drawn between all the die rows and columns, clipped to the wafer circle.
+    """
+    sites, pitch = DieSites(WaferDiameter, ChipSize, DicingLane, EdgeExclusion, Offset)
+    designs, indices = UniqueDesigns(Chips)
+    if Counts is None:
+        assignment = [indices[i % len(Chips)] for i in range(len(sites))]
+    else:
+        assignment = [indices[i] for i, count in enumerate(Counts) for k in range(count)]
+        if len(assignment) > len(sites):
+            raise ValueError(str(len(assignment))+' dies requested but only '+str(len(sites))+' sites fit on the wafer')
+    placed = [dict(column=column, row=row, center=center, design=design)
+              for (column, row, center), design in zip(sites, assignment)]
+
+    Wafer = gds.Cell(WaferCellName, exclude_from_current=True)
+    i = 0
+    while i < len(placed): #One array per run of neighbouring dies of the same design in a row
+        j = i+1
+        while (j < len(placed) and placed[j]['row'] == placed[i]['row'] and placed[j]['design'] == placed[i]['design']
+               and placed[j]['column'] == placed[j-1]['column']+1):
+            j += 1
+        design = designs[placed[i]['design']]
+        if j-i == 1:
+            Wafer.add(gds.CellReference(design, origin=placed[i]['center']))
+        else:
+            Wafer.add(gds.CellArray(design, j-i, 1, (pitch[0], pitch[1]), origin=placed[i]['center']))
+        i = j
+
+    radius = WaferDiameter/2
+    if DicingLayer is not None and sites:
+        columns = sorted({site[0] for site in sites})
+        rows = sorted({site[1] for site in sites})
+        lanes = []
+        for column in range(columns[0], columns[-1]+2): #Vertical lanes, on the left of every column and right of the last one
+            x = column*pitch[0]-pitch[0]/2+Offset[0]
+            if abs(x) < radius:
+                half = np.sqrt(radius**2-x**2)
+                lanes.append(gds.Rectangle((x-DicingLane/2, -half), (x+DicingLane/2, half)))
+        for row in range(rows[0], rows[-1]+2):
+            y = row*pitch[1]-pitch[1]/2+Offset[1]
+            if abs(y) < radius:
+                half = np.sqrt(radius**2-y**2)
+                lanes.append(gds.Rectangle((-half, y-DicingLane/2), (half, y+DicingLane/2)))
+        Wafer.add(gds.boolean(lanes, gds.Round((0,0), radius, tolerance=1), 'and', layer=DicingLayer))
+    if OutlineLayer is not None:
+        Wafer.add(gds.Round((0,0), radius, inner_radius=radius-OutlineWidth, tolerance=1, layer=OutlineLayer))
+    return [Wafer, placed, designs]
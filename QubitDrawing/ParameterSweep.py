@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import collections
+import copy
+import inspect
+import itertools
+import os
+import re
+import gdspy as gds
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from . import qbdraw
+from . import ChipAssembly
+
+"""Parameter sweeps over qubit geometries (e.g. DrawFourJJqubit's JJRelations, JJparameters, FourJJloopLength,
+RectangleWidth and Spacing).
+The variants are drawn in worker processes and streamed back one by one (serialized as in ChipAssembly), geometrically
+identical variants are dropped, and the rest is packed into a labelled test chip or saved as separate GDS files."""
+
+def _SetParameter(parameters, name, value):
+    '''Sets 'name' in the parameters, where 'JJparameters.FingerWidth' is a dictionary entry and 'JJRelations[3]' a list item.'''
+    path = re.findall(r'[^.\[\]]+', name)
+    target = parameters
+    for key in path[:-1]:
+        target = target[int(key) if isinstance(target, list) else key]
+    last = path[-1]
+    target[int(last) if isinstance(target, list) else last] = value
+
+def SweepGrid(Parameters,               #{name: values} for 'cartesian', {name: (min, max) or [values]} for 'latin'
+              Base = {},                #Parameters common to all the variants
+              Mode = 'cartesian',       #'cartesian' product of the values, or 'latin' hypercube sampling
+              Samples = 10,             #Number of latin hypercube samples
+              Seed = None):
+    """
+    Generator of the variants' parameter dictionaries.
+    Names can address a dictionary entry or a list item of a base parameter, e.g.
+    SweepGrid({'JJRelations[3]': np.sqrt([0.3,0.365,0.4]), 'Spacing': [15,20]}, Base={'JJRelations': [1,1,1,1]}).
+    In 'latin' mode a (min, max) tuple is sampled uniformly and a list is sampled among its values.
+    """
+    names = list(Parameters)
+    if Mode == 'cartesian':
+        combinations = itertools.product(*(Parameters[name] for name in names))
+    elif Mode == 'latin':
+        rng = np.random.default_rng(Seed)
+        strata = [(rng.permutation(Samples)+rng.random(Samples))/Samples for name in names] #One sample per stratum per parameter
+        columns = []
+        for name, u in zip(names, strata):
+            values = Parameters[name]
+            if isinstance(values, tuple):
+                columns.append(values[0]+u*(values[1]-values[0]))
+            else:
+                columns.append([values[int(x*len(values))] for x in u])
+        combinations = zip(*columns)
+    else:
+        raise ValueError("Mode should be 'cartesian' or 'latin'")
+    for combination in combinations:
+        parameters = copy.deepcopy(Base)
+        for name, value in zip(names, combination):
+            _SetParameter(parameters, name, value.item() if isinstance(value, np.generic) else value)
+        yield parameters
+
+def _ResultDigest(cells, value):
+    '''Geometry digest of a serialized Draw* result (cell names are not part of it).'''
+    kinds = [value] if isinstance(value, tuple) else value
+    return '_'.join(cells[item]['digest'] if kind == 'cell' else repr(item) for kind, item in kinds)
+
+def SweepVariants(Variants,                         #Iterable of parameter dictionaries (e.g. from SweepGrid)
+                  Function = 'DrawFourJJqubit',     #Name of the qbdraw function
+                  NameParameter = None,             #Cell name parameter, the first one ending with 'CellName' if None
+                  Prefix = 'Variant',               #Variant i is named Prefix+str(i)
+                  Processes = None,                 #Number of worker processes (None: one per core, 1: no pool)
+                  Window = 64,                      #Maximal number of variants in flight
+                  Dedupe = True):                   #Skip variants geometrically identical to a previous one
+    """
+    Generator of the drawn variants, in order, as dictionaries with the 'index', the 'parameters', the geometry
+    'digest' and the 'serialized' result (to be rebuilt with ChipAssembly.DeserializeResult).
+    Only a window of variants is held in memory at a time.
+    """
+    if NameParameter is None:
+        NameParameter = next(p for p in inspect.signature(getattr(qbdraw, Function)).parameters if p.endswith('CellName'))
+    sites = ((index, parameters, {'function': Function, 'parameters': dict(parameters, **{NameParameter: Prefix+str(index)})})
+             for index, parameters in enumerate(Variants))
+
+    seen = set()
+    def collect(index, parameters, serialized):
+        digest = _ResultDigest(*serialized)
+        if Dedupe and digest in seen:
+            return None
+        seen.add(digest)
+        return {'index': index, 'parameters': parameters, 'digest': digest, 'serialized': serialized}
+
+    if Processes == 1:
+        for index, parameters, site in sites:
+            variant = collect(index, parameters, ChipAssembly._BuildSite(site))
+            if variant is not None:
+                yield variant
+        return
+    with ProcessPoolExecutor(max_workers=Processes) as pool:
+        pending = collections.deque()
+        for index, parameters, site in itertools.chain(sites, [(None, None, None)]):
+            if site is not None:
+                pending.append((index, parameters, pool.submit(ChipAssembly._BuildSite, site)))
+            while pending and (len(pending) >= Window or site is None):
+                index_, parameters_, future = pending.popleft()
+                variant = collect(index_, parameters_, future.result())
+                if variant is not None:
+                    yield variant
+
+def PackTestChip(Variants,                      #Iterable of variants from SweepVariants
+                 Columns = 10,                  #Number of variants per row
+                 Pitch = (500, 500),            #Distance between neighbouring variants
+                 TopCellName = 'SweepChip',
+                 LabelSize = 20,                #Height of the labels with the variant index, no labels if 0
+                 LabelOffset = (-200, -200),    #Label position with respect to the variant origin
+                 layer = 2):                    #Layer of the labels
+    """
+    This function returns a list with a test-chip cell, in which the variants are placed row by row (left to right,
+    top to bottom) and labelled with their index, and the list of placed variants (without their serialized cells).
+    """
+    Top = gds.Cell(TopCellName, exclude_from_current=True)
+    registry, placed = {}, []
+    for position, variant in enumerate(Variants):
+        result = ChipAssembly.DeserializeResult(*variant['serialized'], registry)
+        cell = result[0] if isinstance(result, list) else result
+        origin = ((position%Columns)*Pitch[0], -(position//Columns)*Pitch[1])
+        Top.add(gds.CellReference(cell, origin=origin))
+        if LabelSize:
+            Top.add(gds.Text(str(variant['index']), LabelSize, position=np.add(origin, LabelOffset), layer=layer))
+        placed.append({name: value for name, value in variant.items() if name != 'serialized'})
+    return [Top, placed]
+
+def SaveVariants(Variants,              #Iterable of variants from SweepVariants
+                 Directory = '.',
+                 Compress = False):
+    """
+    Saves every variant to its own GDS file (named after its main cell) as it arrives, so that only one variant is
+    rebuilt in memory at a time. Returns the list of file names.
+    """
+    os.makedirs(Directory, exist_ok=True)
+    FileNames = []
+    for variant in Variants:
+        result = ChipAssembly.DeserializeResult(*variant['serialized'], {})
+        cell = result[0] if isinstance(result, list) else result
+        qbdraw.saveCell2GDS(cell, os.path.join(Directory, cell.name), Compress=Compress, SkipUnchanged=True)
+        FileNames.append(os.path.join(Directory, cell.name)+('.gds.gz' if Compress else '.gds'))
+    return FileNames
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import os
+import re
+import gdspy as gds
+import numpy as np
+from . import SuppFunctions as SuppFun
+
+"""Compact, array-backed geometry shared by the downstream consumers (DRC, rendering, solver export).
+A PolygonStore keeps, for every (layer, datatype), all the vertices of the flattened polygons in one contiguous
+(N, 2) float64 array and the polygon boundaries in an offsets array: polygon i is coords[offsets[i]:offsets[i+1]].
+Polygons and slices are numpy views of the buffers (no copy), transforms work on the whole buffer at once and the
+buffers can be saved as .npy files and loaded back memory-mapped."""
+
+def AffineMatrix(origin = (0,0), rotation = 0, magnification = 1, x_reflection = False):
+    '''3x3 matrix of a gdspy placement (reflection about the x axis, magnification, rotation [deg], translation).'''
+    c, s = np.cos(np.deg2rad(rotation)), np.sin(np.deg2rad(rotation))
+    reflection = -1 if x_reflection else 1
+    return np.array([[magnification*c, -magnification*s*reflection, origin[0]],
+                     [magnification*s, magnification*c*reflection, origin[1]],
+                     [0, 0, 1]])
+
+def _Spec(spec):
+    return (spec, 0) if np.isscalar(spec) else tuple(spec)
+
+class PolygonStore:
+    """
+    Per-layer contiguous polygon buffers. 'layers' is a dictionary {(layer, datatype): (coords, offsets)}.
+    Methods taking a spec accept (layer, datatype) or only the layer (datatype 0).
+    """
+    def __init__(self, layers = None):
+        self.layers = {} if layers is None else {_Spec(spec): (np.asarray(coords, dtype=float).reshape(-1, 2), np.asarray(offsets, dtype=np.int64))
+                                                 for spec, (coords, offsets) in layers.items()}
+
+    @classmethod
+    def FromPolygons(cls, polygons):   #Dictionary {(layer, datatype): [polygons]}, e.g. from SuppFun.PolygonsByLayer
+        '''Store with the given polygons, copied once into the contiguous buffers.'''
+        layers = {}
+        for spec, PolygonsList in polygons.items():
+            offsets = np.zeros(len(PolygonsList)+1, dtype=np.int64)
+            np.cumsum([len(p) for p in PolygonsList], out=offsets[1:])
+            coords = np.concatenate(PolygonsList).astype(float) if PolygonsList else np.zeros((0, 2))
+            layers[spec] = (coords, offsets)
+        return cls(layers)
+
+    @classmethod
+    def FromElements(cls, elements, layers = None):
+        '''Store with the flattened polygons of a cell hierarchy, references or paths (only the given layers if any).'''
+        return cls.FromPolygons(SuppFun.PolygonsByLayer(elements, layers))
+
+    def Specs(self):
+        return sorted(self.layers)
+
+    def Buffers(self, spec):
+        '''(coords, offsets) of a layer, empty arrays if it has no polygons.'''
+        return self.layers.get(_Spec(spec), (np.zeros((0, 2)), np.zeros(1, dtype=np.int64)))
+
+    def Count(self, spec):
+        return len(self.Buffers(spec)[1])-1
+
+    def Counts(self):
+        '''Dictionary {(layer, datatype): [number of polygons, number of vertices]}, as SuppFun.PolygonStatistics.'''
+        return {spec: [len(offsets)-1, int(offsets[-1])] for spec, (coords, offsets) in sorted(self.layers.items())}
+
+    def Polygon(self, spec, i):
+        '''View of the vertices of polygon i.'''
+        coords, offsets = self.Buffers(spec)
+        return coords[offsets[i]:offsets[i+1]]
+
+    def Polygons(self, spec):
+        '''List of views of all the polygons of a layer (they can be given directly to the FFSolvers writers).'''
+        coords, offsets = self.Buffers(spec)
+        return [coords[offsets[i]:offsets[i+1]] for i in range(len(offsets)-1)]
+
+    def Slice(self, spec, start, stop):
+        '''Store with polygons start to stop-1 of a layer; its coordinates are a view of this store's buffer.'''
+        coords, offsets = self.Buffers(spec)
+        return PolygonStore({_Spec(spec): (coords[offsets[start]:offsets[stop]], offsets[start:stop+1]-offsets[start])})
+
+    def Select(self, specs):
+        '''Store with only the given layers, sharing the buffers.'''
+        return PolygonStore({_Spec(spec): self.layers[_Spec(spec)] for spec in specs if _Spec(spec) in self.layers})
+
+    def BoundingBoxes(self, spec):
+        '''Array [N][2][2] with the bounding boxes of the polygons of a layer.'''
+        coords, offsets = self.Buffers(spec)
+        if len(offsets) < 2:
+            return np.zeros((0, 2, 2))
+        return np.stack([np.minimum.reduceat(coords, offsets[:-1]), np.maximum.reduceat(coords, offsets[:-1])], axis=1)
+
+    def BoundingBox(self):
+        '''((xmin, ymin), (xmax, ymax)) of all the layers, None if the store is empty.'''
+        coords = [c for c, o in self.layers.values() if len(c)]
+        if not coords:
+            return None
+        return np.array([np.min([c.min(axis=0) for c in coords], axis=0), np.max([c.max(axis=0) for c in coords], axis=0)])
+
+    def Transform(self, matrix, InPlace = False):
+        '''Applies a 3x3 affine matrix (e.g. AffineMatrix(...)) to all the vertices, in one operation per layer.'''
+        matrix = np.asarray(matrix, dtype=float)
+        layers = {}
+        for spec, (coords, offsets) in self.layers.items():
+            if InPlace:
+                coords[:] = coords @ matrix[:2,:2].T + matrix[:2,2]
+                layers[spec] = (coords, offsets)
+            else:
+                layers[spec] = (coords @ matrix[:2,:2].T + matrix[:2,2], offsets)
+        if InPlace:
+            return self
+        return PolygonStore(layers)
+
+    def Merge(self, other):
+        '''New store with the polygons of both stores (layer by layer, this store's first).'''
+        layers = dict(self.layers)
+        for spec, (coords, offsets) in other.layers.items():
+            if spec in layers:
+                coords0, offsets0 = layers[spec]
+                layers[spec] = (np.concatenate([coords0, coords]), np.concatenate([offsets0, offsets[1:]+offsets0[-1]]))
+            else:
+                layers[spec] = (coords, offsets)
+        return PolygonStore(layers)
+
+    def Save(self, Directory):
+        '''Writes L<layer>D<datatype>_coords.npy and _offsets.npy files for every layer in Directory.'''
+        os.makedirs(Directory, exist_ok=True)
+        for (layer, datatype), (coords, offsets) in self.layers.items():
+            np.save(os.path.join(Directory, 'L%dD%d_coords.npy' % (layer, datatype)), np.ascontiguousarray(coords))
+            np.save(os.path.join(Directory, 'L%dD%d_offsets.npy' % (layer, datatype)), offsets)
+        return Directory
+
+    @classmethod
+    def Load(cls, Directory, mmap_mode = 'r'):  #None loads the buffers in memory, 'r' maps them read-only, 'c' copy-on-write
+        '''Store saved with Save, memory-mapped by default.'''
+        layers = {}
+        for FileName in sorted(os.listdir(Directory)):
+            match = re.match(r'L(\d+)D(\d+)_coords\.npy$', FileName)
+            if match:
+                spec = (int(match.group(1)), int(match.group(2)))
+                layers[spec] = (np.load(os.path.join(Directory, FileName), mmap_mode=mmap_mode),
+                                np.load(os.path.join(Directory, 'L%dD%d_offsets.npy' % spec), mmap_mode=mmap_mode))
+        return cls(layers)
+
+    def ToCell(self, CellName):
+        '''gdspy cell with one polygon set per layer.'''
+        cell = gds.Cell(CellName, exclude_from_current=True)
+        for (layer, datatype) in self.Specs():
+            polygons = self.Polygons((layer, datatype))
+            if polygons:
+                cell.add(gds.PolygonSet(polygons, layer=layer, datatype=datatype))
+        return cell
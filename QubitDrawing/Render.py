@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import os
+import numpy as np
+from PIL import Image
+from .PolygonStore import PolygonStore
+
+"""Raster previews of cells.
+The layers are flattened into a PolygonStore and filled with a vectorized scanline: every polygon edge adds +1 or -1
+at the pixel where it crosses each pixel row (center), and a cumulative sum along the rows gives the winding number.
+The polygons are oriented counterclockwise first, so that a pixel is filled if it is inside any polygon (for a single
+polygon this is the even-odd rule, holes connected by slits included, and overlapping polygons add up instead of
+cancelling). Large chips are rendered as tile pyramids: the finest level tile by tile, the coarser levels by 2x2
+averaging."""
+
+LayerColors = {0: (214, 180, 90),   #Negative (evaporated metal)
+               2: (40, 90, 200),    #Circuit
+               5: (220, 40, 40)}    #e-beam
+Background = (255, 255, 255)
+
+def LayerEdges(store, spec):
+    '''Array [E][4] (x0, y0, x1, y1) of the non-horizontal edges of a layer, with counterclockwise polygons.'''
+    coords, offsets = store.Buffers(spec)
+    if len(coords) == 0:
+        return np.zeros((0, 4))
+    counts = np.diff(offsets)
+    following = np.arange(len(coords))+1
+    following[offsets[1:]-1] = offsets[:-1]
+    start, end = coords, coords[following]
+    area = np.add.reduceat(start[:,0]*end[:,1]-end[:,0]*start[:,1], offsets[:-1])
+    clockwise = np.repeat(area < 0, counts)
+    start, end = np.where(clockwise[:,None], end, start), np.where(clockwise[:,None], start, end)
+    keep = start[:,1] != end[:,1]
+    return np.concatenate([start[keep], end[keep]], axis=1)
+
+def Rasterize(edges,            #Array [E][4] from LayerEdges
+              box,              #((xmin, ymin), (xmax, ymax)) of the image
+              shape):           #(rows, columns) of the image, row 0 at the top
+    '''Boolean image of the filled polygons.'''
+    (xmin, ymin), (xmax, ymax) = box
+    rows, columns = shape
+    dx, dy = (xmax-xmin)/columns, (ymax-ymin)/rows
+    x0, y0, x1, y1 = edges.T
+    low, high = np.minimum(y0, y1), np.maximum(y0, y1)
+    #Pixel row j (from the bottom) has its center at ymin+(j+0.5)*dy, rows crossed by an edge: first <= j < last
+    first = np.clip(np.ceil((low-ymin)/dy-0.5), 0, rows).astype(np.int64)
+    last = np.clip(np.ceil((high-ymin)/dy-0.5), 0, rows).astype(np.int64)
+    keep = (last > first) & (np.minimum(x0, x1) < xmax)
+    x0, y0, x1, y1, first, last = x0[keep], y0[keep], x1[keep], y1[keep], first[keep], last[keep]
+    n = last-first
+    edge = np.repeat(np.arange(len(n)), n)
+    row = first[edge]+np.arange(n.sum())-np.repeat(np.cumsum(n)-n, n)
+    yc = ymin+(row+0.5)*dy
+    x = x0[edge]+(yc-y0[edge])*(x1[edge]-x0[edge])/(y1[edge]-y0[edge])
+    column = np.clip(np.ceil((x-xmin)/dx-0.5), 0, columns).astype(np.int64)  #First pixel center right of the crossing
+    sign = np.where(y1[edge] > y0[edge], 1, -1)
+    winding = np.bincount(row*(columns+1)+column, weights=sign, minlength=rows*(columns+1)).reshape(rows, columns+1)
+    return (np.cumsum(winding[:,:-1], axis=1) != 0)[::-1]
+
+def _Compose(masks, colors, Alpha):
+    '''RGB image (uint8) of the layer masks painted in order over the background.'''
+    shape = next(iter(masks.values())).shape if masks else (1, 1)
+    image = np.empty(shape+(3,), dtype=np.float32)
+    image[:] = Background
+    for spec, mask in masks.items():
+        image[mask] = (1-Alpha)*image[mask]+Alpha*np.array(colors.get(spec[0], (128, 128, 128)), dtype=np.float32)
+    return image.astype(np.uint8)
+
+def _Prepare(cell, layers):
+    store = cell if isinstance(cell, PolygonStore) else PolygonStore.FromElements(cell, layers)
+    order = sorted(store.Specs(), key=lambda spec: (list(LayerColors).index(spec[0]) if spec[0] in LayerColors else len(LayerColors), spec))
+    return store, {spec: LayerEdges(store, spec) for spec in order if layers is None or spec[0] in layers}
+
+def _Shape(box, Size):
+    width, height = box[1][0]-box[0][0], box[1][1]-box[0][1]
+    return (max(1, int(round(Size*height/max(width, height)))), max(1, int(round(Size*width/max(width, height)))))
+
+def RenderCell(cell,                    #Cell (or PolygonStore) to render
+               Size = 1024,             #Pixels along the longest side
+               layers = None,           #Layers to render (in the order of LayerColors), all if None
+               box = None,              #Region to render, the bounding box of the cell if None
+               colors = LayerColors,
+               Alpha = 0.75):
+    '''RGB image (numpy uint8 array [rows][columns][3]) of the cell's layers.'''
+    store, edges = _Prepare(cell, layers)
+    box = store.BoundingBox() if box is None else np.asarray(box, dtype=float)
+    if box is None:
+        return np.full((1, 1, 3), Background, dtype=np.uint8)
+    shape = _Shape(box, Size)
+    return _Compose({spec: Rasterize(e, box, shape) for spec, e in edges.items()}, colors, Alpha)
+
+def SavePNG(image, FileName):
+    '''Writes an image from RenderCell (or any uint8 array) as PNG and returns the file name.'''
+    if not FileName.lower().endswith('.png'):
+        FileName += '.png'
+    Image.fromarray(image).save(FileName, optimize=False)
+    return FileName
+
+def Thumbnail(cell, FileName, Size = 512, layers = None):
+    '''Renders the cell and saves the PNG thumbnail.'''
+    return SavePNG(RenderCell(cell, Size, layers), FileName)
+
+def TilePyramid(cell,                   #Cell (or PolygonStore) to render
+                Directory,              #Tiles are written as Directory/<level>/<column>_<row>.png (row 0 at the top)
+                TileSize = 256,         #Pixels per tile side
+                Levels = 5,             #Level 0 is one tile for the whole cell, level k has 2**k x 2**k tiles
+                layers = None,
+                colors = LayerColors,
+                Alpha = 0.75):
+    """
+    This function writes a tile pyramid of the cell (a square region around its bounding box) and returns the list of
+    pixel sizes of the levels. Only the edges that can affect a tile are rasterized for it.
+    """
+    store, edges = _Prepare(cell, layers)
+    box = store.BoundingBox()
+    center, side = (box[0]+box[1])/2, (box[1]-box[0]).max()
+    origin = center-side/2
+    n = 2**(Levels-1)
+    step = side/n
+    EdgeBoxes = {spec: (np.minimum(e[:,1], e[:,3]), np.maximum(e[:,1], e[:,3]), np.minimum(e[:,0], e[:,2])) for spec, e in edges.items()}
+
+    tiles = {}
+    for i in range(n):
+        for j in range(n):
+            TileBox = np.array([origin+[i*step, j*step], origin+[(i+1)*step, (j+1)*step]])
+            masks = {}
+            for spec, e in edges.items():
+                low, high, left = EdgeBoxes[spec]
+                near = (high >= TileBox[0,1]) & (low <= TileBox[1,1]) & (left < TileBox[1,0]) #Edges on the left count for the winding
+                masks[spec] = Rasterize(e[near], TileBox, (TileSize, TileSize))
+            tiles[(i, n-1-j)] = _Compose(masks, colors, Alpha)
+    sizes = []
+    for level in range(Levels-1, -1, -1):
+        os.makedirs(os.path.join(Directory, str(level)), exist_ok=True)
+        for (i, j), tile in tiles.items():
+            SavePNG(tile, os.path.join(Directory, str(level), '%d_%d.png' % (i, j)))
+        sizes.insert(0, side/(2**level*TileSize))
+        if level:
+            coarser = {}
+            for i in range(2**(level-1)):
+                for j in range(2**(level-1)):
+                    block = np.vstack([np.hstack([tiles[(2*i, 2*j)], tiles[(2*i+1, 2*j)]]),
+                                       np.hstack([tiles[(2*i, 2*j+1)], tiles[(2*i+1, 2*j+1)]])]).astype(np.float32)
+                    coarser[(i, j)] = ((block[0::2,0::2]+block[1::2,0::2]+block[0::2,1::2]+block[1::2,1::2])/4).astype(np.uint8)
+            tiles = coarser
+    return sizes
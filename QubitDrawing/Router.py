@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import heapq
+import numpy as np
+from scipy import ndimage
+from .Backend import gds
+from . import qbdraw
+from .PolygonStore import PolygonStore
+from .Render import LayerEdges, Rasterize
+
+"""Automatic routing of coplanar lines (bias lines, feedlines) around the chip's elements.
+The chip is covered by a routing grid whose occupancy mask is the spatial index of the obstacles: the obstacle polygons
+are rasterized once (scanline fill plus their vertices, so that no polygon is missed) and every query is an array
+lookup. For a line of a given width the mask is dilated by its clearance (cached per clearance and updated with every
+new obstacle), and every routed line becomes an obstacle for the next ones.
+Routes are found with A* over (grid cell, direction) states. A turn is followed by a straight run of at least two bend
+radii, so that every corner of the route can be drawn as a circular bend of the configured radius."""
+
+Directions = np.array([[1,0], [0,1], [-1,0], [0,-1]])      #Angles 0, 90, 180 and -90 degrees
+
+def _Direction(angle):
+    return int(round(angle/90)) % 4
+
+def _Reach(free):
+    '''Array [4][nx][ny]: number of consecutive free cells from every cell in every direction (the cell included).'''
+    reach = np.empty((4,)+free.shape, dtype=np.int32)
+    for axis in (0, 1):
+        n = free.shape[axis]
+        i = np.arange(n).reshape((-1, 1) if axis == 0 else (1, -1))
+        following = np.flip(np.minimum.accumulate(np.flip(np.where(free, n, i), axis), axis=axis), axis)    #Next blocked cell
+        preceding = np.maximum.accumulate(np.where(free, -1, i), axis=axis)
+        reach[axis] = following-i
+        reach[axis+2] = i-preceding
+    return reach
+
+class RoutingGrid:
+    """
+    Occupancy grid of a chip centered at the origin. Obstacles are added with AddObstacles (cells, references or
+    polygons) and lines are routed with Route, RouteCPW, RouteBiasLine or RouteFeedline.
+    """
+    def __init__(self,
+                 ChipSize,              #[width, height]
+                 GridSize = 10,         #[um], pitch of the route centers
+                 Obstacles = None,      #Elements to avoid (e.g. the resonator, qubit background, feedline and mark references)
+                 layers = None):        #Layers of the obstacles, all if None
+        self.ChipSize = np.asarray(ChipSize, dtype=float)
+        self.GridSize = GridSize
+        self.shape = tuple(int(n) for n in np.maximum(np.floor(self.ChipSize/GridSize), 1))   #(nx, ny)
+        self.origin = -np.array(self.shape)*GridSize/2                                         #Corner of cell (0, 0)
+        self.occupied = np.zeros(self.shape, dtype=bool)
+        self._blocked = {}     #Dilation radius in cells -> blocked mask
+        if Obstacles is not None:
+            self.AddObstacles(Obstacles, layers)
+
+    def Index(self, point):
+        '''(ix, iy) of the grid cell containing a point, clipped to the grid.'''
+        index = np.floor((np.asarray(point, dtype=float)-self.origin)/self.GridSize).astype(int)
+        return tuple(int(i) for i in np.clip(index, 0, np.array(self.shape)-1))
+
+    def Center(self, index):
+        return self.origin+(np.asarray(index)+0.5)*self.GridSize
+
+    def _Window(self, low, high, margin = 0):
+        '''Slices of the cells low-margin ... high+margin (clipped to the grid).'''
+        return tuple(slice(max(l-margin, 0), min(h+margin+1, n)) for l, h, n in zip(low, high, self.shape))
+
+    def AddObstacles(self, elements, layers = None):
+        '''Marks the polygons of the elements (gdspy elements, a list of them or a PolygonStore) as occupied.'''
+        store = elements if isinstance(elements, PolygonStore) else PolygonStore.FromElements(elements, layers)
+        box = store.BoundingBox()
+        if box is None:
+            return self
+        low, high = self.Index(box[0]), self.Index(box[1])
+        window = self._Window(low, high)
+        shape = tuple(w.stop-w.start for w in window)
+        origin = self.origin+np.array([w.start for w in window])*self.GridSize
+        mask = np.zeros(shape, dtype=bool)
+        for spec in store.Specs():
+            coords = store.Buffers(spec)[0]
+            if len(coords) == 0:
+                continue
+            #Cells whose centers are inside the polygons, and the cells of the vertices (for the polygons smaller than a cell)
+            mask |= Rasterize(LayerEdges(store, spec), (tuple(origin), tuple(origin+np.array(shape)*self.GridSize)), shape[::-1])[::-1].T
+            index = np.floor((coords-origin)/self.GridSize).astype(int)
+            inside = np.all((index >= 0) & (index < shape), axis=1)
+            mask[index[inside,0], index[inside,1]] = True
+        self.AddMask(mask, tuple(w.start for w in window))
+        return self
+
+    def AddMask(self, mask, offset = (0,0)):
+        '''Marks the cells of a boolean mask (whose cell (0, 0) is the grid cell 'offset') as occupied.'''
+        window = self._Window(offset, np.add(offset, mask.shape)-1)
+        self.occupied[window] |= mask
+        for radius, blocked in self._blocked.items():
+            #Only the window around the mask can change
+            around = self._Window(offset, np.add(offset, mask.shape)-1, radius)
+            padded = np.zeros(tuple(w.stop-w.start for w in around), dtype=bool)
+            padded[tuple(slice(w.start-a.start, w.stop-a.start) for w, a in zip(window, around))] = mask
+            blocked[around] |= ndimage.binary_dilation(padded, self._Disk(radius))
+
+    @staticmethod
+    def _Disk(radius):
+        x, y = np.mgrid[-radius:radius+1, -radius:radius+1]
+        return x**2+y**2 <= radius**2+radius    #Cells whose centers are within radius+1/2 cell
+
+    def Blocked(self, Clearance):
+        '''Mask of the cells where a route center would be closer than Clearance [um] to an obstacle.'''
+        radius = int(np.ceil(Clearance/self.GridSize+0.5))     #Half a cell margin for the rasterization
+        if radius not in self._blocked:
+            self._blocked[radius] = ndimage.binary_dilation(self.occupied, self._Disk(radius)) if radius else self.occupied.copy()
+        return self._blocked[radius]
+
+    def Route(self,
+              Start,                    #(x, y) start point of the line's center
+              StartAngle,               #Direction of the line at the start [deg], 0, 90, 180 or -90
+              End,                      #(x, y) end point
+              EndAngle = None,          #Direction of the line at the end, any if None
+              Clearance = 20,           #Minimal distance [um] between the line's center and the obstacles
+              BendRadius = 50,
+              BendCost = 5,             #Extra cost of a bend, in grid cells
+              FreeLength = None):       #Length [um] around the start and end where the obstacles are ignored (e.g. a terminal next to a qubit), 2*BendRadius if None
+        """
+        This function returns the list of points (start, corners, end) of the shortest orthogonal route with few bends
+        between the start and end points, or raises ValueError if there is none. The start and end points do not need
+        to be on the grid: the first and last segments are aligned with them.
+        """
+        G = self.GridSize
+        FreeLength = 2*BendRadius if FreeLength is None else FreeLength
+        free = ~self.Blocked(Clearance)
+        Start, End = np.asarray(Start, dtype=float), np.asarray(End, dtype=float)
+        StartIndex, EndIndex = self.Index(Start), self.Index(End)
+        d0 = _Direction(StartAngle)
+        d1 = None if EndAngle is None else _Direction(EndAngle)
+        #Cells close to the start and end (only behind the end if its direction is given) are always free
+        margin = int(np.ceil(FreeLength/G))
+        for point, index, direction in ((Start, StartIndex, None), (End, EndIndex, d1)):
+            window = self._Window(index, index, margin)
+            x, y = np.meshgrid(*[np.arange(w.start, w.stop) for w in window], indexing='ij')
+            centers = self.Center(np.stack([x, y], axis=-1))-point
+            near = np.hypot(centers[...,0], centers[...,1]) <= FreeLength
+            if direction is not None:
+                near &= centers @ Directions[direction] <= G
+            free[window] |= near
+        components = ndimage.label(free)[0]     #Fails fast when the end cannot be reached at all
+        if components[StartIndex] == 0 or components[StartIndex] != components[EndIndex]:
+            raise ValueError('No route found from '+str(tuple(Start))+' to '+str(tuple(End)))
+        reach = _Reach(free).reshape(4, -1)
+
+        #Flat cell indices c = x*ny+y, states (c*4+d)*2+turned
+        nx, ny = self.shape
+        ex, ey = EndIndex
+        offsets = [ny, 1, -ny, -1]
+        steps = Directions.tolist()
+        TurnRun = int(np.ceil(2*BendRadius/G))+1        #+1 for the alignment of the first and last segments
+        StartRun = int(np.ceil(BendRadius/G))+1
+        collinear = abs(Directions[d0][0]*(End-Start)[1]-Directions[d0][1]*(End-Start)[0]) < 1e-9      #A route without bends is possible
+        goal = ex*ny+ey
+
+        def heuristic(c, d):    #Manhattan distance and the bends that are needed at least
+            x, y = divmod(c, ny)
+            dx, dy = ex-x, ey-y
+            along = dx*steps[d][0]+dy*steps[d][1]
+            bends = 0 if along >= 0 and dx*steps[d][1]-dy*steps[d][0] == 0 else (1 if along >= 0 else 2)
+            return abs(dx)+abs(dy)+bends*BendCost
+
+        c0 = StartIndex[0]*ny+StartIndex[1]
+        if reach[d0][c0] < StartRun:
+            raise ValueError('The start of the route is blocked')
+        c0 += (StartRun-1)*offsets[d0]
+        start = (c0*4+d0)*2
+        cost = {start: StartRun}
+        parent = {start: None}
+        queue = [(StartRun+heuristic(c0, d0), -StartRun, start)]
+        found = None
+        while queue:
+            f, g, state = heapq.heappop(queue)
+            g = -g
+            if g > cost[state]:
+                continue
+            c, d, turned = state >> 3, (state >> 1) & 3, state & 1
+            if c == goal and (d1 is None or d == d1) and (turned or collinear):
+                found = state
+                break
+            #Straight step, or a turn followed by TurnRun straight cells (reach counts the current cell)
+            for direction, n, extra, t in ((d, 1, 0, turned), ((d+1) % 4, TurnRun, BendCost, 1), ((d+3) % 4, TurnRun, BendCost, 1)):
+                if reach[direction][c] > n:
+                    cell = c+n*offsets[direction]
+                    new = (cell*4+direction)*2+t
+                    g1 = g+n+extra
+                    if g1 < cost.get(new, g1+1):
+                        cost[new] = g1
+                        parent[new] = state
+                        heapq.heappush(queue, (g1+heuristic(cell, direction), -g1, new))
+        if found is None:
+            raise ValueError('No route found from '+str(tuple(Start))+' to '+str(tuple(End)))
+
+        states = []
+        while found is not None:
+            states.append(found)
+            found = parent[found]
+        states = states[::-1]
+        #Corners: cells where the direction changes (the cell before a turn's run)
+        corners = []
+        for previous, state in zip(states[:-1], states[1:]):
+            if (state >> 1) & 3 != (previous >> 1) & 3:
+                corners.append([(previous >> 3)//ny, (previous >> 3) % ny, (previous >> 1) & 3, (state >> 1) & 3])
+        points = [Start]
+        for i, (x, y, before, after) in enumerate(corners):
+            corner = self.Center((x, y))
+            #The first segment is aligned with the start, the last one with the end
+            if i == 0:
+                corner[Directions[before] == 0] = Start[Directions[before] == 0]
+            if i == len(corners)-1:
+                corner[Directions[after] == 0] = End[Directions[after] == 0]
+            points.append(corner)
+        points.append(End)
+        return np.array(points)
+
+    def Reserve(self, points, Width):
+        '''Marks the cells within Width/2 of the orthogonal polyline as occupied (a routed line becomes an obstacle).'''
+        half = int(np.ceil(Width/2/self.GridSize))
+        for a, b in zip(points[:-1], points[1:]):
+            low, high = self.Index(np.minimum(a, b)), self.Index(np.maximum(a, b))
+            self.occupied[self._Window(low, high, half)] = True
+            for radius, blocked in self._blocked.items():
+                blocked[self._Window(low, high, half+radius)] = True
+
+def _Angle(a, b):
+    return float(np.degrees(np.arctan2(b[1]-a[1], b[0]-a[0])))
+
+def RouteLength(points, BendRadius):
+    '''Length of a route drawn with circular bends of radius BendRadius at its (90 degrees) corners.'''
+    points = np.asarray(points, dtype=float)
+    return float(np.hypot(*np.diff(points, axis=0).T).sum()-(len(points)-2)*(2-np.pi/2)*BendRadius)
+
+def RouteCPW(grid,                      #RoutingGrid of the chip
+             Start,                     #(x, y) start of the line's center
+             StartAngle,                #Direction of the line at the start [deg]
+             End,
+             EndAngle = None,           #Direction of the line at the end, any if None
+             LineCellName = 'Route',
+             LineWidth = 5,             #Center line width
+             SpaceWidth = 6,            #Space between the line and the ground plane
+             BendRadius = 50,
+             Spacing = 20,              #Minimal distance between the line's gaps and the obstacles (and other routes)
+             FreeLength = None,         #See RoutingGrid.Route
+             layer = 2):
+    """
+    This function routes a coplanar line (two gaps, as the qbdraw lines) around the grid's obstacles and returns a list
+    with the line cell, its length and the route points. The line is then an obstacle for the following routes.
+    """
+    points = grid.Route(Start, StartAngle, End, EndAngle, Clearance=LineWidth/2+SpaceWidth+Spacing, BendRadius=BendRadius, FreeLength=FreeLength)
+    line = gds.Cell(LineCellName, exclude_from_current=True)
+    line.add(gds.FlexPath(points, [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth, corners='circular bend', bend_radius=BendRadius,
+                          layer=layer, tolerance=qbdraw.Precision['tolerance']))
+    grid.Reserve(points, LineWidth+2*SpaceWidth)
+    return [line, RouteLength(points, BendRadius), points]
+
+def RouteBiasLine(grid,                 #RoutingGrid of the chip
+                  Launcher,             #(x, y) connection of the launcher (usually close to the chip edge)
+                  LauncherAngle,        #Direction of the line leaving the launcher [deg]
+                  Terminal,             #(x, y) end of the line at the qubit, where the terminal is placed
+                  TerminalAngle = None, #Direction of the line arriving at the terminal, any if None
+                  BiaslineCellName = 'Biasline',
+                  LineWidth = 5,
+                  SpaceWidth = 6,
+                  BendRadius = 50,
+                  Spacing = 20,
+                  Tshape = True,
+                  Galvanic = False,
+                  TerminalWidth = 60,
+                  BigWidth = 96,
+                  LauncherWidth = 352,
+                  FreeLength = None,
+                  layer = 2):
+    """
+    This function returns a list with a routed biasline cell (launcher, routed line and the qbdraw.DrawBiasLine terminal),
+    its line length and route points. The cell origin is the chip origin.
+    """
+    route = RouteCPW(grid, Launcher, LauncherAngle, Terminal, TerminalAngle, BiaslineCellName+'Route', LineWidth, SpaceWidth,
+                     BendRadius, Spacing, FreeLength, layer)
+    launcher = qbdraw.DrawLauncher(BiaslineCellName+'Launcher', LineWidth, SpaceWidth, BigWidth, LauncherWidth, layer)
+    terminal = qbdraw.DrawBiasTerminal(BiaslineCellName+'Terminal', LineWidth, SpaceWidth, Tshape, Galvanic, TerminalWidth, layer)
+    Biasline = gds.Cell(BiaslineCellName, exclude_from_current=True)
+    Biasline.add(gds.CellReference(launcher, origin=tuple(route[2][0]), rotation=LauncherAngle))
+    Biasline.add(gds.CellReference(route[0]))
+    Biasline.add(gds.CellReference(terminal, origin=tuple(route[2][-1]), rotation=_Angle(route[2][-2], route[2][-1])))
+    grid.AddObstacles(Biasline.references[::2])
+    return [Biasline, route[1], route[2]]
+
+def RouteFeedline(grid,
+                  Start,                #(x, y) connection of the first launcher
+                  StartAngle,           #Direction of the line leaving the first launcher [deg]
+                  End,                  #(x, y) connection of the second launcher
+                  EndAngle = None,      #Direction of the line arriving at the second launcher, any if None
+                  FeedlineCellName = 'Feedline',
+                  LineWidth = 10,
+                  SpaceWidth = 6,
+                  BendRadius = 100,
+                  Spacing = 20,
+                  BigWidth = 96,
+                  LauncherWidth = 352,
+                  FreeLength = None,
+                  layer = 2):
+    """
+    This function returns a list with a routed transmission feedline cell (two launchers and the routed line), its
+    line length and route points. The cell origin is the chip origin.
+    """
+    route = RouteCPW(grid, Start, StartAngle, End, EndAngle, FeedlineCellName+'Route', LineWidth, SpaceWidth,
+                     BendRadius, Spacing, FreeLength, layer)
+    launcher = qbdraw.DrawLauncher(FeedlineCellName+'Launcher', LineWidth, SpaceWidth, BigWidth, LauncherWidth, layer)
+    Feedline = gds.Cell(FeedlineCellName, exclude_from_current=True)
+    Feedline.add(gds.CellReference(launcher, origin=tuple(route[2][0]), rotation=StartAngle))
+    Feedline.add(gds.CellReference(route[0]))
+    Feedline.add(gds.CellReference(launcher, origin=tuple(route[2][-1]), rotation=_Angle(route[2][-2], route[2][-1])+180))
+    grid.AddObstacles(Feedline.references[::2])
+    return [Feedline, route[1], route[2]]
+
+def RouteBiasLines(grid,                #RoutingGrid of the chip
+                   lines,               #List of dictionaries of RouteBiasLine parameters
+                   BiaslineCellName = 'Biasline',   #Prefix of the cell names: BiaslineCellName+'0', BiaslineCellName+'1', ...
+                   **parameters):
+    """
+    Routes a list of bias lines, given as dictionaries of RouteBiasLine parameters (at least 'Launcher', 'LauncherAngle'
+    and 'Terminal'), in order; the other parameters are common to all the lines. A line's own 'BiaslineCellName'
+    replaces the numbered name. Returns the list of RouteBiasLine results.
+    """
+    return [RouteBiasLine(grid, **dict(dict(parameters, BiaslineCellName=BiaslineCellName+str(i)), **line)) for i, line in enumerate(lines)]
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import hashlib
+import inspect
+import os
+import shutil
+import numpy as np
+from . import FFSolvers
+from . import SolverRunner
+
+"""Content-addressed on-disk cache of solver inputs and results.
+The key is a hash of the normalized polygons (translated to the origin and rounded), their names, the permittivities
+and the solver settings, so an unchanged geometry is never simulated twice, whatever its file name or position.
+Every entry is a directory with the solver input file and the parsed result (result.npz). The least recently used
+entries are removed when the cache grows beyond CacheSettings['maxbytes'], and the entries of failed runs (without
+result.npz) are removed by the next eviction."""
+
+CacheSettings = {'directory': os.path.join(os.path.expanduser('~'), '.QubitDrawingSolverCache'),
+                 'maxbytes': 2**30}
+
+Writers = {'FastHenry': FFSolvers.FastHenry, 'FasterCap': FFSolvers.FasterCap, 'FasterCap2D': FFSolvers.FasterCap2D}
+Solvers = {'FastHenry': 'FastHenry', 'FasterCap': 'FasterCap', 'FasterCap2D': 'FasterCap'} #Writer -> SolverRunner solver
+
+def SolverKey(Solver,               #'FastHenry', 'FasterCap' or 'FasterCap2D'
+              Polygons,
+              PolygonsNames = [],
+              epsilon_e = [],
+              Settings = {},        #Other arguments of the writer (e.g. LineWidth, Tolerance)
+              digits = 6):
+    '''sha256 key of a solver problem. Polygons translated together give the same key.'''
+    Polygons = [np.asarray(Polygon, dtype=float) for Polygon in Polygons]
+    origin = np.min([Polygon.min(0) for Polygon in Polygons], axis=0) if Polygons else np.zeros(2)
+    key = hashlib.sha256(repr((Solver, [len(Polygon) for Polygon in Polygons], list(PolygonsNames),
+                               [float(e) for e in epsilon_e], sorted(Settings.items()))).encode())
+    for Polygon in Polygons:
+        key.update((np.round(Polygon-origin, digits)+0.0).tobytes()) #+0.0 turns -0.0 into 0.0
+    return key.hexdigest()
+
+def _EntryDirectory(key):
+    return os.path.join(CacheSettings['directory'], key[:2], key)
+
+def Lookup(key):
+    """
+    Cached result of a key, None if it is not in the cache. It has the keys of a successful SolverRunner result
+    ('solver', 'input', 'directory', 'returncode' 0, 'error' None, the parsed matrices, ...) and 'cached' True.
+    """
+    ResultFile = os.path.join(_EntryDirectory(key), 'result.npz')
+    try:
+        with np.load(ResultFile) as stored:
+            result = {name: stored[name] for name in stored.files}
+    except IOError:
+        return None
+    os.utime(ResultFile) #Most recently used
+    if 'matrices' in result:
+        result['matrices'] = list(result['matrices'])
+    if 'names' in result:
+        result['names'] = result['names'].tolist()
+    result['input'] = str(result['input'])
+    result.update(solver=str(result['solver']) if 'solver' in result else None, directory=_EntryDirectory(key),
+                  returncode=0, stdout='', stderr='', error=None, cached=True)
+    return result
+
+def Store(key, result,
+          evict = True):        #False when storing a batch, Evict is then called once after it
+    '''Saves the parsed matrices of a SolverRunner result for the key and evicts old entries if needed.'''
+    arrays = {name: result[name] for name in ('frequencies', 'matrices', 'matrix', 'names') if result.get(name) is not None}
+    if 'matrices' in arrays:
+        arrays['matrices'] = np.stack(arrays['matrices'])
+    np.savez(os.path.join(_EntryDirectory(key), 'result.npz'), input=result['input'], solver=result['solver'], **arrays)
+    if evict:
+        Evict()
+
+def _Entries():
+    '''Paths of the entry directories of the cache.'''
+    if not os.path.isdir(CacheSettings['directory']):
+        return []
+    return [entry.path for prefix in os.scandir(CacheSettings['directory']) if prefix.is_dir()
+            for entry in os.scandir(prefix.path) if entry.is_dir()]
+
+def Evict(maxbytes = None,
+          keep = ()):           #Keys of the entries to keep even without result (e.g. the failed runs just returned)
+    '''
+    Removes the entries without result.npz (failed runs) and the least recently used entries until the cache is
+    smaller than maxbytes (CacheSettings['maxbytes'] if None).
+    '''
+    maxbytes = CacheSettings['maxbytes'] if maxbytes is None else maxbytes
+    entries = []
+    for root in _Entries():
+        ResultFile = os.path.join(root, 'result.npz')
+        if not os.path.exists(ResultFile):
+            if os.path.basename(root) not in keep:
+                shutil.rmtree(root, ignore_errors=True)
+            continue
+        size = sum(os.path.getsize(os.path.join(root, f)) for f in os.listdir(root))
+        entries.append((os.path.getmtime(ResultFile), size, root))
+    total = sum(size for used, size, root in entries)
+    for used, size, root in sorted(entries):
+        if total <= maxbytes:
+            break
+        shutil.rmtree(root, ignore_errors=True)
+        total -= size
+
+def ClearCache():
+    '''Removes the whole cache directory.'''
+    shutil.rmtree(CacheSettings['directory'], ignore_errors=True)
+
+def _Arguments(problem):
+    '''Writer arguments of a problem: its entries the writer takes, with a FastHenry Cell (and layer, datatype) turned into Polygons.'''
+    parameters = inspect.signature(Writers[problem['solver']]).parameters
+    arguments = {name: value for name, value in problem.items() if name in parameters and name != 'Name'}
+    if arguments.get('Cell') is not None:
+        layer = arguments.pop('layer', parameters['layer'].default)
+        datatype = arguments.pop('datatype', parameters['datatype'].default)
+        arguments['Polygons'] = FFSolvers.CellPolygons(arguments.pop('Cell'), layer, datatype)
+    arguments.pop('Cell', None)
+    return arguments
+
+def SolveCached(Problems,               #List of dictionaries with the writer arguments and 'solver' (see below)
+                MaxWorkers = 4,
+                Timeout = None):
+    """
+    Returns the results of the solver problems, taking them from the cache when possible. Every problem is a
+    dictionary such as {'solver': 'FasterCap', 'Polygons': [...], 'PolygonsNames': [...]} whose other entries are passed
+    to the writer (FFSolvers.FastHenry, FasterCap or FasterCap2D) if it takes them; the other entries (e.g. epsilon_e
+    of a FasterCap problem) are ignored, also in the key. A FastHenry problem can give a 'Cell' (with 'layer' and
+    'datatype') instead of 'Polygons'. Only the problems missing from the cache are written and run (concurrently,
+    with SolverRunner), identical problems only once; failed runs are returned but not cached.
+    """
+    results, jobs, missing, first, duplicates = [None]*len(Problems), [], {}, {}, []
+    for i, problem in enumerate(Problems):
+        arguments = _Arguments(problem)
+        settings = {name: value for name, value in arguments.items() if name not in ('Polygons', 'PolygonsNames', 'epsilon_e')}
+        key = SolverKey(problem['solver'], arguments.get('Polygons', []), arguments.get('PolygonsNames', []), arguments.get('epsilon_e', []),
+                        {name: repr(value) for name, value in settings.items()})
+        if key in first:                #Same problem earlier in the batch, solved (or looked up) once
+            duplicates.append((i, first[key]))
+            continue
+        first[key] = i
+        results[i] = Lookup(key)
+        if results[i] is None:
+            directory = _EntryDirectory(key)
+            shutil.rmtree(directory, ignore_errors=True)    #Input of a previous failed run
+            os.makedirs(directory)
+            InputFile = Writers[problem['solver']](os.path.join(directory, 'input'), **arguments)
+            jobs.append(SolverRunner.SolverJob(Solvers[problem['solver']], InputFile, WorkingDirectory=directory))
+            missing[key] = i
+    for (key, i), result in zip(missing.items(), SolverRunner.RunSolverJobs(jobs, MaxWorkers, Timeout)):
+        result['cached'] = False
+        if result['error'] is None:
+            Store(key, result, evict=False)
+        results[i] = result
+    for i, j in duplicates:
+        results[i] = dict(results[j])
+    if missing:
+        Evict(keep=[key for key, i in missing.items() if results[i]['error'] is not None])
+    return results
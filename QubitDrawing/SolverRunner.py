@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import os
+import re
+import subprocess
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+"""Non-interactive runner for the FastHenry and FasterCap input files written by FFSolvers.
+The solvers run as concurrent subprocesses, each one in its own working directory (FastHenry always writes Zc.mat in
+the current directory), and their outputs are parsed into numpy matrices.
+The executables are looked up in SolverExecutables, which can point to any other program (e.g. a stub for tests)."""
+
+SolverExecutables = {'FastHenry': 'fasthenry',  #Executable names or full paths
+                     'FasterCap': 'FasterCap'}
+SolverArguments = {'FastHenry': [],             #Arguments placed before the input file
+                   'FasterCap': ['-b']}         #Batch mode, no GUI
+
+_Number = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+
+def ParseZcMat(FileName):
+    '''List with the frequencies [Hz] and the complex impedance matrices (one per frequency) in a FastHenry Zc.mat file.'''
+    with open(FileName) as file:
+        lines = file.read().splitlines()
+    frequencies, matrices = [], []
+    for i, line in enumerate(lines):
+        header = re.match(r'\s*Impedance matrix for frequency\s*=\s*('+_Number+r')\s+(\d+)\s*x\s*(\d+)', line)
+        if header:
+            rows = int(header.group(2))
+            values = [[complex(float(re_), float(im.replace(' ', ''))) for re_, im in
+                       re.findall(r'('+_Number+r')\s*([-+]\s*(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)j', row)]
+                      for row in lines[i+1:i+1+rows]]
+            frequencies.append(float(header.group(1)))
+            matrices.append(np.array(values))
+    return [np.array(frequencies), matrices]
+
+def ParseFasterCapOutput(text):
+    '''List with the last capacitance matrix [F] printed by FasterCap and the conductor names of its rows.'''
+    lines = text.splitlines()
+    starts = [i for i, line in enumerate(lines) if re.match(r'\s*Dimension\s+\d+\s*x\s*\d+', line)]
+    if not starts:
+        return [None, []]
+    start = starts[-1]
+    rows = int(re.findall(r'\d+', lines[start])[0])
+    names, values = [], []
+    for line in lines[start+1:start+1+rows]:
+        tokens = line.split()
+        names.append(re.sub(r'^g\d+_', '', tokens[0]))
+        values.append([float(token) for token in tokens[1:]])
+    return [np.array(values), names]
+
+def SolverJob(Solver,                   #'FastHenry' or 'FasterCap'
+              InputFile,                #Input file written by FFSolvers.FastHenry/FasterCap/FasterCap2D
+              WorkingDirectory = None,  #Directory in which the solver runs, InputFile without extension + '_run' if None
+              Arguments = None,         #Solver arguments, SolverArguments[Solver] if None
+              Executable = None):       #SolverExecutables[Solver] if None
+    '''Dictionary describing one solver run, to be given to RunSolverJobs.'''
+    InputFile = os.path.abspath(InputFile)
+    return {'solver': Solver,
+            'input': InputFile,
+            'directory': WorkingDirectory or os.path.splitext(InputFile)[0]+'_run',
+            'arguments': SolverArguments[Solver] if Arguments is None else Arguments,
+            'executable': Executable or SolverExecutables[Solver]}
+
+def RunSolverJob(job, Timeout = None):
+    """
+    Runs one solver job and returns a dictionary with the job, 'returncode', 'stdout', 'stderr', 'error' (None if it
+    succeeded) and the parsed results: 'frequencies' and 'matrices' for FastHenry, 'matrix' and 'names' for FasterCap.
+    """
+    result = dict(job, returncode=None, stdout='', stderr='', error=None)
+    os.makedirs(job['directory'], exist_ok=True)
+    if job['solver'] == 'FastHenry' and os.path.exists(os.path.join(job['directory'], 'Zc.mat')):
+        os.remove(os.path.join(job['directory'], 'Zc.mat')) #Not to parse the result of a previous run
+    try:
+        process = subprocess.run([job['executable']]+list(job['arguments'])+[job['input']], cwd=job['directory'],
+                                 capture_output=True, text=True, timeout=Timeout)
+    except subprocess.TimeoutExpired as exception:
+        result['error'] = 'Timeout after '+str(Timeout)+' s'
+        result['stdout'] = exception.stdout.decode(errors='replace') if isinstance(exception.stdout, bytes) else (exception.stdout or '')
+        return result
+    except OSError as exception:
+        result['error'] = str(exception)
+        return result
+    result.update(returncode=process.returncode, stdout=process.stdout, stderr=process.stderr)
+    if process.returncode != 0:
+        result['error'] = 'Exit code '+str(process.returncode)
+
+    if job['solver'] == 'FastHenry':
+        ZcMat = os.path.join(job['directory'], 'Zc.mat')
+        if os.path.exists(ZcMat):
+            result['frequencies'], result['matrices'] = ParseZcMat(ZcMat)
+        elif result['error'] is None:
+            result['error'] = 'No Zc.mat written'
+    else:
+        result['matrix'], result['names'] = ParseFasterCapOutput(process.stdout)
+        if result['matrix'] is None and result['error'] is None:
+            result['error'] = 'No capacitance matrix in the output'
+    return result
+
+def RunSolverJobs(Jobs,                 #List of SolverJob dictionaries
+                  MaxWorkers = 4,       #Maximal number of solvers running at the same time
+                  Timeout = None):      #[s], per job
+    '''Runs the solver jobs concurrently and returns their RunSolverJob results, in the order of Jobs.'''
+    with ThreadPoolExecutor(max_workers=MaxWorkers) as pool:
+        return list(pool.map(lambda job: RunSolverJob(job, Timeout), Jobs))
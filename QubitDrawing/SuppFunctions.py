@@ -35,16 +35,89 @@ def coplanar_waveguide(epsilon_r,       #Dielectric constant of the substrate
     '''Impedance and effective relative permittivity of a micro strip placed on a dialectric material.
     https://sci-hub.tw/10.1049/el:19840120. (or Simons p.21).
     Calculation using elliptic integrals of the first kind.
-    Matching the calculator in https://www.microwaves101.com/calculators/864-coplanar-waveguide-calculator'''
+    Matching the calculator in https://www.microwaves101.com/calculators/864-coplanar-waveguide-calculator
+    All the inputs can be numpy arrays (broadcast against each other), in which case Z_0 and epsilon_e are arrays.'''
     
+    epsilon_r, d, W, S = (np.asarray(x, dtype=float) for x in (epsilon_r, d, W, S))
     k_0 = W/(W+2*S)
     k_1 = np.sinh(np.pi*W/(4*d))/np.sinh((np.pi*(W+2*S))/(4*d))
     k_00 = np.sqrt(1-np.square(k_0)) #k'_0 in book notation
     k_11 = np.sqrt(1-np.square(k_1)) #k'_1 in book notation
-    epsilon_e = 1+ (((epsilon_r-1)/2) * (sp.ellipk(k_1)/sp.ellipk(k_11)) * (sp.ellipk(k_00)/sp.ellipk(k_0)))
-    Z_0 = (30*np.pi/np.sqrt(epsilon_e))*(sp.ellipk(k_00)/sp.ellipk(k_0))
+    K_ratio_0 = sp.ellipk(k_00)/sp.ellipk(k_0) #Used by both epsilon_e and Z_0
+    epsilon_e = 1+ (((epsilon_r-1)/2) * (sp.ellipk(k_1)/sp.ellipk(k_11)) * K_ratio_0)
+    Z_0 = (30*np.pi/np.sqrt(epsilon_e))*K_ratio_0
     return Z_0, epsilon_e
 
+def coplanar_waveguide_table(epsilon_r,                  #Dielectric constant of the substrate
+                             d,                          #[length], substrate's height
+                             W_range = (0.1, 1000),      #[length], (min, max) strip widths in the table
+                             S_range = (0.1, 1000),      #[length], (min, max) spaces from ground plane in the table
+                             Z_range = (10, 200),        #[Ohm], (min, max) impedances in the table
+                             points = 256,               #Grid points per axis (the W axis used to build it is 4 times denser)
+                             TableFile = None):          #.npz file to load the table from, or to save it to if it does not exist
+    '''Interpolation table of the strip width W as a function of (log(S), Z_0), used by coplanar_waveguide_inverse.
+    The table is built once with a single vectorized coplanar_waveguide call over a (S, W) grid.
+    If TableFile is given and holds a table with the same parameters it is loaded instead of being rebuilt.'''
+    
+    parameters = np.array([epsilon_r, d, *W_range, *S_range, *Z_range, points], dtype=float)
+    if TableFile is not None:
+        if not str(TableFile).endswith('.npz'):
+            TableFile = str(TableFile)+'.npz'
+        try:
+            with np.load(TableFile) as stored:
+                if np.array_equal(stored['parameters'], parameters):
+                    return {key: stored[key] for key in stored.files}
+                print('Table in '+TableFile+' was built with different parameters, rebuilding it.')
+        except IOError:
+            pass
+    
+    logS = np.linspace(np.log(S_range[0]), np.log(S_range[1]), points)
+    logW = np.linspace(np.log(W_range[0]), np.log(W_range[1]), 4*points)
+    Z = np.linspace(Z_range[0], Z_range[1], points)
+    Z_0 = coplanar_waveguide(epsilon_r, d, np.exp(logW)[None,:], np.exp(logS)[:,None])[0]
+    #Z_0 decreases with W, so every row is inverted after reversing it. Impedances out of reach are NaN.
+    table = np.array([np.interp(Z, row[::-1], logW[::-1], left=np.nan, right=np.nan) for row in Z_0])
+    table = {'parameters': parameters, 'logS': logS, 'Z': Z, 'logW': table}
+    if TableFile is not None:
+        np.savez(TableFile, **table)
+    return table
+
+def coplanar_waveguide_inverse(Z_target,            #[Ohm], target impedance(s), e.g. 50
+                               epsilon_r,           #Dielectric constant of the substrate
+                               d,                   #[length], substrate's height
+                               S,                   #[length], space(s) from ground plane
+                               table = None,        #Table from coplanar_waveguide_table, built (or loaded from TableFile) if None
+                               TableFile = None,
+                               refine = False):     #If True, polish the interpolated W with a few Newton steps on the exact formula
+    '''Strip width(s) W giving the target impedance(s) for the given space(s) S from ground plane.
+    Z_target and S are broadcast against each other, so a whole grid of designs is solved in one call,
+    e.g. coplanar_waveguide_inverse(50, 11.68, 500, np.linspace(2,20,100)) returns the 100 matching widths.
+    Designs outside of the table range are NaN.'''
+    
+    if table is None:
+        table = coplanar_waveguide_table(epsilon_r, d, TableFile=TableFile)
+    if not np.allclose(table['parameters'][:2], (epsilon_r, d)):
+        raise ValueError('Table was built for epsilon_r, d = '+str(table['parameters'][:2].tolist())+', not '+str([epsilon_r, d]))
+    Z_target, S = np.broadcast_arrays(np.asarray(Z_target, dtype=float), np.asarray(S, dtype=float))
+    
+    '''Bilinear interpolation on the uniform (log(S), Z) grid'''
+    logS, Z, logW = table['logS'], table['Z'], table['logW']
+    x = (np.log(S)-logS[0])/(logS[1]-logS[0])
+    y = (Z_target-Z[0])/(Z[1]-Z[0])
+    outside = (x<0) | (x>len(logS)-1) | (y<0) | (y>len(Z)-1)
+    i = np.clip(np.floor(x).astype(int), 0, len(logS)-2)
+    j = np.clip(np.floor(y).astype(int), 0, len(Z)-2)
+    x, y = x-i, y-j
+    W = np.exp((1-x)*(1-y)*logW[i,j] + x*(1-y)*logW[i+1,j] + (1-x)*y*logW[i,j+1] + x*y*logW[i+1,j+1])
+    W = np.where(outside, np.nan, W)
+    
+    if refine:
+        for iteration in range(3):
+            Z_0 = coplanar_waveguide(epsilon_r, d, W, S)[0]
+            dZdW = (coplanar_waveguide(epsilon_r, d, W*(1+1e-6), S)[0]-Z_0)/(W*1e-6)
+            W = W-(Z_0-Z_target)/dZdW
+    return W
+
 def Wavelength2Frequency(Wavelength,   #[m]
                          epsilon_e=1): #Effective relative permittivity, default is vacuum.
 
@@ -59,4 +132,144 @@ def Frequency2Wavelength(Frequency,    #[Hz]
     c = 299792458                   #[m/s], speed of light in vacuum
     v_p =  c/np.sqrt(epsilon_e)     #[m/s], phase velocity                               
     Wavelength = v_p/Frequency     
-    return Wavelength
\ No newline at end of file
+    return Wavelength
+
+def ResonatorLength(elongation,         #meander horizontal segment length
+                    num_meanders,       #number of meanders in the resonator
+                    LineWidth):         #resonator line width, the turns radius is 5*LineWidth
+    '''Total length of a qbdraw.DrawResonator resonator. Works element-wise on numpy arrays.'''
+    radius = 5*LineWidth
+    return (elongation+np.pi*radius)*(1+2*num_meanders)-radius
+
+def PlanResonators(Frequencies,                 #[Hz], target resonance frequencies (array-like)
+                   epsilon_r = 11.68,           #Dielectric constant of the substrate
+                   d = 500,                     #[um], substrate's height
+                   LineWidth = 10,              #[um], resonator line width
+                   SpaceWidth = 6,              #[um], spacing between resonator and ground plane
+                   WavelengthFraction = 1/4,    #Resonator length in wavelengths (1/4 for quarter-wave resonators)
+                   num_meanders = None,         #Fixed number of meanders (scalar or per resonator), otherwise the smallest that fits
+                   MaxMeanders = 50,
+                   MaxWidth = None,             #[um], maximal resonator width (horizontal extent of the meanders)
+                   MaxHeight = None,            #[um], maximal resonator height (from the feedline connection)
+                   MinSpacing = 0):             #[Hz], minimal spacing between the target frequencies
+    '''
+    Inverts the qbdraw.DrawResonator length formula for a whole set of resonators at once.
+    Returns a list with the elongations, the numbers of meanders and the resonator lengths [um] (numpy arrays,
+    in the order of Frequencies) to be passed to DrawResonator with the same LineWidth and SpaceWidth.
+    '''
+    Frequencies = np.atleast_1d(np.asarray(Frequencies, dtype=float))
+    SortedFrequencies = np.sort(Frequencies)
+    TooClose = np.diff(SortedFrequencies) < MinSpacing
+    if TooClose.any():
+        raise ValueError('Target frequencies closer than MinSpacing: '+str(SortedFrequencies[np.flatnonzero(TooClose)]))
+    
+    epsilon_e = coplanar_waveguide(epsilon_r, d, LineWidth, SpaceWidth)[1]
+    Lengths = WavelengthFraction*Frequency2Wavelength(Frequencies, epsilon_e)*1e6  #[um]
+    radius = 5*LineWidth
+    
+    if num_meanders is None:
+        Meanders = np.arange(1, MaxMeanders+1)[None,:]
+    else:
+        Meanders = np.broadcast_to(np.asarray(num_meanders), Frequencies.shape)[:,None]
+    Elongations = (Lengths[:,None]+radius)/(1+2*Meanders)-np.pi*radius
+    Fits = Elongations >= 2*radius #The qubit coupler needs elongation/2 >= radius
+    if MaxWidth is not None:
+        Fits &= Elongations+2*radius+LineWidth+2*SpaceWidth <= MaxWidth
+    if MaxHeight is not None:
+        #Feedline coupler (and its 0.1 straight part), meanders (and their last 0.1 straight part), qubit coupler down to the
+        #terminal's outer edge (half a SpaceWidth below its center line)
+        Fits &= 2*SpaceWidth+LineWidth+0.1+radius+0.1+Meanders*(4*radius+0.5)+2*radius+LineWidth+SpaceWidth+SpaceWidth/2 <= MaxHeight
+    if not Fits.any(axis=1).all():
+        raise ValueError('No meander number fits the limits for frequencies: '+str(Frequencies[~Fits.any(axis=1)]))
+    Choice = np.argmax(Fits, axis=1) #First (smallest) fitting number of meanders
+    rows = np.arange(len(Frequencies))
+    Meanders = np.broadcast_to(Meanders, Elongations.shape)[rows, Choice]
+    Elongations = Elongations[rows, Choice]
+    return [Elongations, Meanders, ResonatorLength(Elongations, Meanders, LineWidth)]
+
+def PolygonsByLayer(elements,       #Cell, reference, path, polygon set or a list of them
+                    layers = None): #If given, only polygons in these layers are returned
+    '''Dictionary {(layer, datatype): [polygons]} of all the polygons (Nx2 arrays) in the given gdspy elements.'''
+    if not isinstance(elements, (list, tuple)):
+        elements = [elements]
+    result = {}
+    for element in elements:
+        if hasattr(element, 'get_polygons'):    #Cells, references, arrays and paths
+            ElementPolygons = element.get_polygons(by_spec=True).items()
+        else:                                   #Polygon sets
+            ElementPolygons = [((l, d), [p]) for l, d, p in zip(element.layers, element.datatypes, element.polygons)]
+        for (layer, datatype), polygons in ElementPolygons:
+            if layers is None or layer in layers:
+                result.setdefault((int(layer), int(datatype)), []).extend(polygons)
+    return result
+
+def BoundingBoxes(polygons):
+    '''Array [N][2][2] with the bounding boxes ((xmin, ymin), (xmax, ymax)) of N polygons, without a python loop over the vertices.'''
+    if len(polygons) == 0:
+        return np.zeros((0,2,2))
+    offsets = np.cumsum([0]+[len(p) for p in polygons[:-1]])
+    points = np.concatenate(polygons)
+    return np.stack([np.minimum.reduceat(points, offsets), np.maximum.reduceat(points, offsets)], axis=1)
+
+def PolygonStatistics(elements, layers = None):
+    '''Dictionary {(layer, datatype): [number of polygons, number of vertices]} of the given gdspy elements.'''
+    return {spec: [len(polygons), int(sum(len(p) for p in polygons))]
+            for spec, polygons in sorted(PolygonsByLayer(elements, layers).items())}
+
+def _GridEntries(boxes, CellSize):
+    '''Indices of the boxes and keys of the grid cells they cover (one entry per box and cell).'''
+    low = np.floor(boxes[:,0]/CellSize).astype(np.int64)
+    high = np.floor(boxes[:,1]/CellSize).astype(np.int64)
+    n = high-low+1
+    counts = n[:,0]*n[:,1]
+    index = np.repeat(np.arange(len(boxes)), counts)
+    k = np.arange(counts.sum())-np.repeat(np.cumsum(counts)-counts, counts)
+    ix = low[index,0]+k % n[index,0]
+    iy = low[index,1]+k // n[index,0]
+    return index, (ix << 32) + (iy & 0xffffffff)
+
+def _GroupPairs(first, last):
+    '''For every position p, the positions p+1 ... last[p]-1 (vectorized nested loop), as two arrays.'''
+    m = last-first
+    start = np.repeat(first, m) if len(m) else first
+    k = np.arange(m.sum())-np.repeat(np.cumsum(m)-m, m)
+    return np.repeat(np.arange(len(m)), m), start+k
+
+def BoxPairs(BoxesA,            #Array [N][2][2] of bounding boxes, e.g. from BoundingBoxes
+             BoxesB = None,     #Second set of boxes, pairs within BoxesA if None
+             Distance = 0,      #Boxes closer than this distance also make a pair
+             CellSize = None):  #Grid cell size, from the box sizes and the distance if None
+    """
+    Array [M][2] of the index pairs (i, j) of boxes that overlap or are closer than Distance, found with a uniform grid
+    instead of comparing all the pairs. Within one set only pairs with i < j are returned.
+    """
+    BoxesA = np.asarray(BoxesA, dtype=float)
+    Expanded = BoxesA+np.array([[-Distance,-Distance],[Distance,Distance]])
+    if len(BoxesA) == 0 or (BoxesB is not None and len(BoxesB) == 0):
+        return np.zeros((0,2), dtype=np.int64)
+    if CellSize is None:
+        sizes = BoxesA[:,1]-BoxesA[:,0] if BoxesB is None else np.concatenate([BoxesA[:,1]-BoxesA[:,0], BoxesB[:,1]-BoxesB[:,0]])
+        CellSize = max(np.median(sizes.max(axis=1))*2, 4*Distance, 1e-9)
+    IndexA, KeysA = _GridEntries(Expanded, CellSize)
+    if BoxesB is None:
+        order = np.argsort(KeysA, kind='stable')
+        IndexA, KeysA = IndexA[order], KeysA[order]
+        last = np.searchsorted(KeysA, KeysA, 'right')
+        p, q = _GroupPairs(np.arange(len(KeysA))+1, last)
+        i, j = IndexA[p], IndexA[q]
+        i, j = np.minimum(i, j), np.maximum(i, j)
+        keep = i != j
+        BoxesB, i, j = BoxesA, i[keep], j[keep]
+    else:
+        BoxesB = np.asarray(BoxesB, dtype=float)
+        IndexB, KeysB = _GridEntries(BoxesB, CellSize)
+        order = np.argsort(KeysB, kind='stable')
+        IndexB, KeysB = IndexB[order], KeysB[order]
+        p, q = _GroupPairs(np.searchsorted(KeysB, KeysA, 'left'), np.searchsorted(KeysB, KeysA, 'right'))
+        i, j = IndexA[p], IndexB[q]
+    pairs = np.unique(np.stack([i, j], axis=1), axis=0)
+    if len(pairs) == 0:
+        return pairs.astype(np.int64)
+    a, b = Expanded[pairs[:,0]], BoxesB[pairs[:,1]]
+    close = np.all(a[:,0] <= b[:,1], axis=1) & np.all(b[:,0] <= a[:,1], axis=1)
+    return pairs[close]
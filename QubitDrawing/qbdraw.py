@@ -5,15 +5,109 @@ Created on Tue Mar 10 14:55:47 2020
 @author: Quantico
 """
 
-import gdspy as gds
+import datetime
+import gzip
+import hashlib
+import os
+from .Backend import gds
 import numpy as np
 from . import SuppFunctions as SuppFun
+from .CellCache import memoize_cell
+from .Instrumentation import instrument_cell, section
+from . import CellCache
 
-def saveCell2GDS(cell, gdsName):
-    """ This function save the given cell to GDS file with the name 'gdsName' """
-    layout = gds.GdsLibrary()
-    layout.add(cell, overwrite_duplicate=True)
-    layout.write_gds(gdsName+'.gds')
+'''Curve precision of the generated paths (FlexPath turns and circular bends) and fillets, for all the Draw* functions.'''
+PrecisionModes = {'production': {'tolerance': 0.01, 'points_per_2pi': 128},  #gdspy defaults, for mask builds
+                  'draft': {'tolerance': 0.25, 'points_per_2pi': 8}}          #Coarse curves, for layout review
+Precision = dict(PrecisionModes['production'], mode='production')
+CellCache.add_key_context(lambda: ('precision', Precision['tolerance'], Precision['points_per_2pi']))
+
+def SetPrecision(mode = 'production',       #'production', 'draft' or 'custom'
+                 tolerance = None,          #FlexPath tolerance [um], overrides the mode's value
+                 points_per_2pi = None):    #Vertices per full circle of the fillets, overrides the mode's value
+    '''Sets the curve precision used by the following Draw* calls (cached cells of another precision are not reused).
+    'custom' keeps the current values, changed by tolerance and points_per_2pi.'''
+    if mode not in PrecisionModes and mode != 'custom':
+        raise ValueError("Unknown precision mode '"+str(mode)+"', should be 'production', 'draft' or 'custom'")
+    Precision.update(PrecisionModes.get(mode, Precision), mode=mode)
+    if tolerance is not None:
+        Precision['tolerance'] = tolerance
+    if points_per_2pi is not None:
+        Precision['points_per_2pi'] = points_per_2pi
+
+def VertexCount(cell):
+    '''List with the total number of vertices of the (flattened) cell and its {(layer, datatype): [polygons, vertices]} statistics.'''
+    statistics = SuppFun.PolygonStatistics(cell)
+    return [sum(s[1] for s in statistics.values()), statistics]
+
+class _HashingFile:
+    """Binary file wrapper that updates a hash with everything written through it."""
+    def __init__(self, file):
+        self.file = file
+        self.hash = hashlib.sha256()
+    def write(self, data):
+        self.hash.update(data)
+        return self.file.write(data)
+
+def _FileHash(FileName, Compress):
+    """sha256 of the (uncompressed) content of an existing GDS file, None if it does not exist."""
+    try:
+        with (gzip.open if Compress else open)(FileName, 'rb') as file:
+            FileHash = hashlib.sha256()
+            for chunk in iter(lambda: file.read(1<<20), b''):
+                FileHash.update(chunk)
+            return FileHash.hexdigest()
+    except (IOError, EOFError):
+        return None
+
+#GDS date written by saveCell2GDS(..., SkipUnchanged=True) when no timestamp is given. It is fixed on purpose: the
+#file then only depends on the layout, so an unchanged layout gives the same bytes and the write can be skipped.
+ReproducibleTimestamp = datetime.datetime(2020, 1, 1)
+
+def saveCell2GDS(cell,                  #Cell, list of cells or any iterable (e.g. a generator) yielding cells
+                 gdsName,
+                 Compress = False,      #If True the file is gzip compressed and named gdsName+'.gds.gz'
+                 SkipUnchanged = False, #If True an existing file with the same content is not rewritten
+                 timestamp = None):     #Written in the file, ReproducibleTimestamp when SkipUnchanged if None (the current time otherwise)
+    """
+    This function save the given cell to GDS file with the name 'gdsName'.
+    The cells (and the cells they reference) are streamed to the file one by one as the iterable yields them,
+    without building a GdsLibrary in memory. A cell seen again is written once; two different cells with the same
+    name raise a ValueError (and no file is left when SkipUnchanged).
+    Returns False if the write was skipped because the file already had the same content, True otherwise.
+    """
+    FileName = gdsName+('.gds.gz' if Compress else '.gds')
+    if SkipUnchanged and timestamp is None:
+        timestamp = ReproducibleTimestamp
+    TemporaryName = FileName+'.tmp' if SkipUnchanged else FileName
+    if isinstance(cell, gds.Cell):
+        cell = [cell]
+    
+    try:
+        with open(TemporaryName, 'wb') as RawFile:
+            OutputFile = gzip.GzipFile(fileobj=RawFile, mode='wb', mtime=0) if Compress else RawFile
+            OutputFile = _HashingFile(OutputFile)
+            writer = gds.GdsWriter(OutputFile, unit=1e-6, precision=1e-9, timestamp=timestamp)
+            written = {}
+            for TopCell in cell:
+                for c in [TopCell]+sorted(TopCell.get_dependencies(True), key=lambda c: c.name):
+                    if c.name not in written:
+                        writer.write_cell(c, timestamp=timestamp)
+                        written[c.name] = c
+                    elif written[c.name] is not c:  #Skipping it would leave its geometry out of the mask
+                        raise ValueError('Two different cells are named '+c.name+', rename one of them')
+            writer.close()
+            if Compress:
+                OutputFile.file.close()
+        
+        if SkipUnchanged:
+            if _FileHash(FileName, Compress) == OutputFile.hash.hexdigest():
+                return False
+            os.replace(TemporaryName, FileName)
+    finally:
+        if SkipUnchanged and os.path.exists(TemporaryName): #Unchanged file or failed write
+            os.remove(TemporaryName)
+    return True
 
 def create_pad(PadOrigin,
                PadLength,
@@ -59,18 +153,23 @@ def CreateMarks(nx = 2,     #number of columns
     
     return crmk, mkar
 
+@memoize_cell
+@instrument_cell
 def DrawResonator(    ResonatorCellName = 'Resonator',
                       LineWidth = 10,               #resonator line width (i.e. resist spacing)           
                       SpaceWidth = 6,               #spacing between resonator and ground plane (resist) 
                       elongation = 150,             #meander horizontal segment length            
                       num_meanders = 1,             #number of meanders in the resonator
                       TerminalWidth = 100,          #Terminal part total width
-                      layer = 2):                   #Layer 2 is usually the circuit layer
+                      layer = 2,                    #Layer 2 is usually the circuit layer
+                      MeanderMode = 'path'):        #'path': one path for all the meanders, 'array': one period cell repeated with a CellArray
     """
     This function returns a list with a resonator cell that contains cell references to a feedline coupler,
     meander(s) and a qubit coupler.
     The total length of the resonator is also returned in the list.
     The cell origin is defined at the connection to the feedline.
+    In 'array' mode the meanders are one period cell (DrawMeanderPeriod, shared by the resonators with the same
+    widths and elongation) placed num_meanders times, with the same geometry and length as in 'path' mode.
     """
     
     radius = 5*LineWidth               #radius of turns
@@ -83,7 +182,7 @@ def DrawResonator(    ResonatorCellName = 'Resonator',
     # coupler_path.turn(radius, 'l')
     # coupler_path.segment((140,0), relative = True)
     # coupler_end_point = (140+2*radius, -50-radius-60)
-    coupler_path = gds.FlexPath([(0,-2*SpaceWidth-LineWidth),(elongation/2,-2*SpaceWidth-LineWidth)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth , layer=layer)
+    coupler_path = gds.FlexPath([(0,-2*SpaceWidth-LineWidth),(elongation/2,-2*SpaceWidth-LineWidth)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth , layer=layer, tolerance=Precision['tolerance'])
     coupler_path.turn(radius, 'r')
     coupler_path.segment((0,-0.1), relative=True)
     # coupler_path.segment((0,-elongation/2), relative = True)
@@ -92,27 +191,36 @@ def DrawResonator(    ResonatorCellName = 'Resonator',
     
     '''meanders'''
     meander = gds.Cell(ResonatorCellName+'Meander', exclude_from_current=True)
-    meander_path = gds.FlexPath([(0,0),(0,-0.1)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth , layer=layer)
-    for i in range (num_meanders):
-        meander_path.turn(radius, 'r')
-        meander_path.segment((-elongation,0), relative = True)
-        meander_path.turn(radius, 'll')
-        meander_path.segment((elongation,0), relative = True)
-        meander_path.turn(radius, 'r')
-        meander_path.segment((0,-0.5), relative = True)
+    if MeanderMode == 'array':
+        #The name holds all the period's geometry, so that different periods never share a name (also without the cell cache)
+        PeriodKey = CellCache.KeyHash(CellCache.canonicalize([LineWidth, SpaceWidth, elongation, layer, Precision['tolerance']]), 12)
+        period = DrawMeanderPeriod('MeanderPeriod_'+PeriodKey, LineWidth, SpaceWidth, elongation, layer)
+        meander.add(gds.CellArray(period, 1, num_meanders, (0, -(4*radius+0.5))))
+        meander.add(gds.FlexPath([(0,-num_meanders*(4*radius+0.5)),(0,-num_meanders*(4*radius+0.5)-0.1)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth , layer=layer, tolerance=Precision['tolerance']))
+    elif MeanderMode == 'path':
+        meander_path = gds.FlexPath([(0,0),(0,-0.1)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth , layer=layer, tolerance=Precision['tolerance'])
+        for i in range (num_meanders):
+            meander_path.turn(radius, 'r')
+            meander_path.segment((-elongation,0), relative = True)
+            meander_path.turn(radius, 'll')
+            meander_path.segment((elongation,0), relative = True)
+            meander_path.turn(radius, 'r')
+            meander_path.segment((0,-0.5), relative = True)
+        meander.add(meander_path)
+    else:
+        raise ValueError("Unknown MeanderMode '"+str(MeanderMode)+"', should be 'path' or 'array'")
     meanders_end_point = tuple(map(sum, zip(coupler_end_point, (0, -0.1-num_meanders*(4*radius+0.5)))))
-    meander.add(meander_path)
     
     '''qubit coupler'''
     qcoupler = gds.Cell(ResonatorCellName+'QubitCoupler', exclude_from_current=True)
-    qcoupler_path=gds.FlexPath([(0,0),(0,-1)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth , layer=layer)
+    qcoupler_path=gds.FlexPath([(0,0),(0,-1)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth , layer=layer, tolerance=Precision['tolerance'])
     qcoupler_path.turn(radius, 'r')
     qcoupler_path.segment((-elongation/2+radius,0), relative = True)
     qcoupler_path.turn(radius, 'l')
     qcoupler_terminal = gds.FlexPath([(-1*radius-elongation/2-LineWidth/2,-2*radius),(-1*radius-elongation/2-LineWidth/2-TerminalWidth/2,-2*radius),
                                       (-1*radius-elongation/2-LineWidth/2-TerminalWidth/2,-2*radius-LineWidth-SpaceWidth), (-1*radius-elongation/2+LineWidth/2+TerminalWidth/2,-2*radius-LineWidth-SpaceWidth),
                                       (-1*radius-elongation/2+LineWidth/2+TerminalWidth/2,-2*radius), (-1*radius-elongation/2+LineWidth/2,-2*radius)], 
-                                     SpaceWidth, ends= 'flush', corners="circular bend", bend_radius=0.6*SpaceWidth, layer=layer)
+                                     SpaceWidth, ends= 'flush', corners="circular bend", bend_radius=0.6*SpaceWidth, layer=layer, tolerance=Precision['tolerance'])
     qcoupler.add(qcoupler_path)
     qcoupler.add(qcoupler_terminal)
     
@@ -124,10 +232,38 @@ def DrawResonator(    ResonatorCellName = 'Resonator',
     Resonator.add(gds.CellReference(meander, origin=coupler_end_point))
     Resonator.add(gds.CellReference(qcoupler, origin=meanders_end_point))
     
-    ResonatorLength = (elongation+np.pi*radius)*(1+2*num_meanders)-radius
+    ResonatorLength = SuppFun.ResonatorLength(elongation, num_meanders, LineWidth)
     
     return [Resonator, ResonatorLength]
 
+@memoize_cell
+@instrument_cell
+def DrawMeanderPeriod(  MeanderPeriodCellName = 'MeanderPeriod',
+                        LineWidth = 10,
+                        SpaceWidth = 6,
+                        elongation = 150,
+                        layer = 2):
+    """
+    This function returns the cell of one DrawResonator meander period, from (0,0) down to (0,-(4*radius+0.5))
+    where the next period starts (radius = 5*LineWidth).
+    The 0.1 straight part before the first turn of 'path' mode is drawn at the start of every period and the 0.5
+    straight part between the periods is shortened to 0.4, so that the repeated periods (and a last 0.1 straight part)
+    draw the same path.
+    """
+    radius = 5*LineWidth
+    period = gds.Cell(MeanderPeriodCellName, exclude_from_current=True)
+    period_path = gds.FlexPath([(0,0),(0,-0.1)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth , layer=layer, tolerance=Precision['tolerance'])
+    period_path.turn(radius, 'r')
+    period_path.segment((-elongation,0), relative = True)
+    period_path.turn(radius, 'll')
+    period_path.segment((elongation,0), relative = True)
+    period_path.turn(radius, 'r')
+    period_path.segment((0,-0.4), relative = True)
+    period.add(period_path)
+    return period
+
+@memoize_cell
+@instrument_cell
 def DrawLauncher(   LauncherCellName = 'IndependentLauncher',
                     LineWidth = 10,               #resonator line width (resist spacing)           
                     SpaceWidth = 6,              #spacing between resonator and grounding plane (resist)
@@ -148,6 +284,7 @@ def DrawLauncher(   LauncherCellName = 'IndependentLauncher',
     Launcher.add(gds.Polygon(LauncherCurve.get_points(),layer=layer))
     return Launcher
 
+@instrument_cell
 def DrawTransmissionFeedline(   FeedlineCellName = 'Feedline',
                     MainlineLength = 2000,
                     LineWidth = 10,                #width of transmission line
@@ -171,7 +308,7 @@ def DrawTransmissionFeedline(   FeedlineCellName = 'Feedline',
     
     '''main line'''
     mainline = gds.Cell(FeedlineCellName+'Mainline', exclude_from_current=True)
-    mainline.add(gds.FlexPath([(0,0),(MainlineLength,0)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth , layer=layer))
+    mainline.add(gds.FlexPath([(0,0),(MainlineLength,0)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth , layer=layer, tolerance=Precision['tolerance']))
     
     #Adds cell references to main cell
     Feedline = gds.Cell(FeedlineCellName, exclude_from_current=True)
@@ -181,6 +318,7 @@ def DrawTransmissionFeedline(   FeedlineCellName = 'Feedline',
 
     return [Feedline]
 
+@instrument_cell
 def DrawReflectionFeedline(   FeedlineCellName = 'Feedline',
                     MainlineLength = 3000,
                     LineWidth = 10,              #width of feedline
@@ -204,7 +342,7 @@ def DrawReflectionFeedline(   FeedlineCellName = 'Feedline',
     
     '''main line'''
     mainline = gds.Cell(FeedlineCellName+'Mainline', exclude_from_current=True)
-    path = gds.FlexPath([(0,0),(MainlineLength,0)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth , layer=layer)
+    path = gds.FlexPath([(0,0),(MainlineLength,0)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth , layer=layer, tolerance=Precision['tolerance'])
     path.turn(LauncherWidth, 'r')
     path.segment((0,-MainlineLength/4), relative=True)
     mainline.add(path)
@@ -216,6 +354,8 @@ def DrawReflectionFeedline(   FeedlineCellName = 'Feedline',
 
     return [Feedline]
 
+@memoize_cell
+@instrument_cell
 def DrawJosephsonJunction(    JosephsonJunctionCellName = 'IndependentJosephsonJunction',
                               LineWidth = 2,                #width of line connected to the junction (i.e. basis' length)
                               FingerWidth = 0.36,           #
@@ -238,6 +378,8 @@ def DrawJosephsonJunction(    JosephsonJunctionCellName = 'IndependentJosephsonJ
     JosephsonJunction.add(gds.Polygon(JosephsonJunctionCurve.get_points(),layer=layer))
     return JosephsonJunction
 
+@memoize_cell
+@instrument_cell
 def DrawFourJJloop(   FourJJloopCellName = '4JJloop',
                     FourJJloopLength = 10.5,
                     FourJJloopWidth = None,                      #Square loop, unless width is specified
@@ -283,6 +425,8 @@ def DrawFourJJloop(   FourJJloopCellName = '4JJloop',
     
     return FourJJloop
 
+@memoize_cell
+@instrument_cell
 def DrawFourJJqubit    (   FourJJqubitCellName = '4JJqubit',
                     FourJJloopLength = 10.5,
                     FourJJloopWidth = 0,                        #Square loop, unless width is specified
@@ -309,8 +453,8 @@ def DrawFourJJqubit    (   FourJJqubitCellName = '4JJqubit',
     if (FourJJloopWidth==0):
         FourJJloopWidth = FourJJloopLength #If width is not specifically defined make a square loop
         
-    '''Four JJ loop'''
-    FourJJqubit =  DrawFourJJloop(   FourJJloopCellName = FourJJqubitCellName,
+    '''Four JJ loop''' #Not taken from the cell cache, since references are added to it below
+    FourJJqubit =  DrawFourJJloop.__wrapped__(   FourJJloopCellName = FourJJqubitCellName,
                     FourJJloopLength = FourJJloopLength,
                     FourJJloopWidth = FourJJloopWidth,
                     LineWidth = LineWidth,                #width of the RFsquid line
@@ -325,18 +469,19 @@ def DrawFourJJqubit    (   FourJJqubitCellName = '4JJqubit',
     # print("qubit origin with respect to the capacitor center:", qubit_origin) #Uncomment to know qubit location
         
     FourJJBackground = gds.Cell(FourJJqubitCellName+'Capacitor', exclude_from_current=True)
-    Plate1 = gds.Rectangle((-RectangleWidth/2,Spacing),(RectangleWidth/2,Spacing+RectangleLength)).fillet(Spacing/2)
-    Plate2 = gds.Rectangle((-RectangleWidth/2,-Spacing-RectangleLength),(RectangleWidth/2,-Spacing)).fillet(Spacing/2)
-    CapacitorBackground = gds.Rectangle((-RectangleWidth/2-Spacing,-2*Spacing-RectangleLength),(Spacing+RectangleWidth/2,2*Spacing+RectangleLength)).fillet(Spacing/2)
-    QubitBackground = gds.Rectangle((qubit_origin[0]-FourJJloopWidth/2-Spacing,qubit_origin[1]-FourJJloopLength/2-Spacing),(-RectangleWidth/2,qubit_origin[1]+FourJJloopLength/2+Spacing)).fillet(Spacing/2)
+    Plate1 = gds.Rectangle((-RectangleWidth/2,Spacing),(RectangleWidth/2,Spacing+RectangleLength)).fillet(Spacing/2, points_per_2pi=Precision['points_per_2pi'])
+    Plate2 = gds.Rectangle((-RectangleWidth/2,-Spacing-RectangleLength),(RectangleWidth/2,-Spacing)).fillet(Spacing/2, points_per_2pi=Precision['points_per_2pi'])
+    CapacitorBackground = gds.Rectangle((-RectangleWidth/2-Spacing,-2*Spacing-RectangleLength),(Spacing+RectangleWidth/2,2*Spacing+RectangleLength)).fillet(Spacing/2, points_per_2pi=Precision['points_per_2pi'])
+    QubitBackground = gds.Rectangle((qubit_origin[0]-FourJJloopWidth/2-Spacing,qubit_origin[1]-FourJJloopLength/2-Spacing),(-RectangleWidth/2,qubit_origin[1]+FourJJloopLength/2+Spacing)).fillet(Spacing/2, points_per_2pi=Precision['points_per_2pi'])
     
-    FourJJBackground.add(gds.boolean([QubitBackground,CapacitorBackground], [Plate1,Plate2], 'not', layer=CircuitLayer))
+    with section(FourJJqubitCellName+' boolean', 'boolean'):
+        FourJJBackground.add(gds.boolean([QubitBackground,CapacitorBackground], [Plate1,Plate2], 'not', layer=CircuitLayer))
  
     '''Connection lines and pads'''
     FourJJconnectionLine = gds.Cell(FourJJqubitCellName+'ConnectionLine', exclude_from_current=True)
     FourJJconnectionLine.add(gds.Rectangle((RectangleWidth/2-(3/2)*FourJJloopLength,Spacing+FourJJloopLength/2), (RectangleWidth/2+FourJJloopLength/2,Spacing+FourJJloopLength*(3/2)) ,layer=eBeamLayer))
     ConnectionLinePath = gds.FlexPath([(RectangleWidth/2-FourJJloopLength/2,FourJJloopLength+Spacing),(RectangleWidth/2-FourJJloopWidth/2,FourJJloopLength/2),(RectangleWidth/4-FourJJloopWidth/2,FourJJloopLength/2)], 
-                                          2*LineWidth, corners="circular bend", bend_radius=2*LineWidth,  layer=eBeamLayer)
+                                          2*LineWidth, corners="circular bend", bend_radius=2*LineWidth,  layer=eBeamLayer, tolerance=Precision['tolerance'])
     ConnectionLinePath.segment((FourJJloopWidth/2+LineWidth/2,FourJJloopLength/2), width = LineWidth)
     FourJJconnectionLine.add(ConnectionLinePath)
     
@@ -346,6 +491,8 @@ def DrawFourJJqubit    (   FourJJqubitCellName = '4JJqubit',
     
     return [FourJJqubit, FourJJBackground, qubit_origin]
 
+@memoize_cell
+@instrument_cell
 def DrawFourJJgroundedLoop(   FourJJloopCellName = '4JJloop',
                     FourJJloopLength = 10.5,
                     FourJJloopWidth = 0,                         #Square loop, unless width is specified
@@ -391,6 +538,8 @@ def DrawFourJJgroundedLoop(   FourJJloopCellName = '4JJloop',
     
     return FourJJloop
 
+@memoize_cell
+@instrument_cell
 def DrawFourJJgroundedQubit    (   FourJJqubitCellName = '4JJqubit',
                     FourJJloopLength = 10.5,
                     FourJJloopWidth = 0,                        #Square loop, unless width is specified
@@ -416,8 +565,8 @@ def DrawFourJJgroundedQubit    (   FourJJqubitCellName = '4JJqubit',
     if (FourJJloopWidth==0):
         FourJJloopWidth = FourJJloopLength #If width is not specifically defined make a square loop
         
-    '''Four JJ loop'''
-    FourJJqubit =  DrawFourJJgroundedLoop(FourJJloopCellName = FourJJqubitCellName,
+    '''Four JJ loop''' #Not taken from the cell cache, since references are added to it below
+    FourJJqubit =  DrawFourJJgroundedLoop.__wrapped__(FourJJloopCellName = FourJJqubitCellName,
                     FourJJloopLength = FourJJloopLength,
                     FourJJloopWidth = FourJJloopWidth,
                     LineWidth = LineWidth,                #width of the RFsquid line
@@ -430,10 +579,11 @@ def DrawFourJJgroundedQubit    (   FourJJqubitCellName = '4JJqubit',
     # print("qubit origin with respect to the capacitor center:", qubit_origin) #Uncomment to know qubit location
         
     FourJJBackground = gds.Cell(FourJJqubitCellName+'Capacitor', exclude_from_current=True)
-    Cross = gds.Rectangle((-RectangleWidth/2,Spacing),(RectangleWidth/2,Spacing+RectangleLength)).fillet(Spacing/2)
-    CapacitorBackground = gds.Rectangle((-RectangleWidth/2-Spacing,-0*Spacing),(Spacing+RectangleWidth/2,2*Spacing+RectangleLength)).fillet(Spacing/2)
-    QubitBackground = gds.Rectangle((qubit_origin[0]-FourJJloopWidth/2-Spacing,qubit_origin[1]-FourJJloopLength/2-0*Spacing),(qubit_origin[0]+FourJJloopWidth/2+Spacing,qubit_origin[1]+FourJJloopLength/2+Spacing)).fillet(Spacing/2)
-    FourJJBackground.add(gds.boolean([QubitBackground,CapacitorBackground], [Cross], 'not', layer=CircuitLayer))
+    Cross = gds.Rectangle((-RectangleWidth/2,Spacing),(RectangleWidth/2,Spacing+RectangleLength)).fillet(Spacing/2, points_per_2pi=Precision['points_per_2pi'])
+    CapacitorBackground = gds.Rectangle((-RectangleWidth/2-Spacing,-0*Spacing),(Spacing+RectangleWidth/2,2*Spacing+RectangleLength)).fillet(Spacing/2, points_per_2pi=Precision['points_per_2pi'])
+    QubitBackground = gds.Rectangle((qubit_origin[0]-FourJJloopWidth/2-Spacing,qubit_origin[1]-FourJJloopLength/2-0*Spacing),(qubit_origin[0]+FourJJloopWidth/2+Spacing,qubit_origin[1]+FourJJloopLength/2+Spacing)).fillet(Spacing/2, points_per_2pi=Precision['points_per_2pi'])
+    with section(FourJJqubitCellName+' boolean', 'boolean'):
+        FourJJBackground.add(gds.boolean([QubitBackground,CapacitorBackground], [Cross], 'not', layer=CircuitLayer))
  
     '''Connection lines and pads'''
     FourJJconnectionLine = gds.Cell(FourJJqubitCellName+'ConnectionLine', exclude_from_current=True)
@@ -454,6 +604,41 @@ def DrawFourJJgroundedQubit    (   FourJJqubitCellName = '4JJqubit',
     
     return [FourJJqubit, FourJJBackground, qubit_origin]
 
+@memoize_cell
+@instrument_cell
+def DrawBiasTerminal (  TerminalCellName = 'BiaslineTerminal',
+                        LineWidth = 5,                #Width of bias line
+                        SpaceWidth = 6,               #Space between bias line and ground plane
+                        Tshape = True,                #If False the terminal is only one-sided
+                        Galvanic = False,             #If True the terminal is not closed on the far side
+                        TerminalWidth = 60,           #Terminal part total width (assuming T-shape)
+                        layer = 2):
+    """
+    This function returns the terminal (antenna) cell of a bias line coming from the left (-x).
+    The cell origin is defined at the end of the bias line's center.
+    """
+    terminal = gds.Cell(TerminalCellName, exclude_from_current=True)
+    
+    #Antenna connected to ground plane
+    terminal.add(gds.Rectangle((-SpaceWidth,LineWidth/2+SpaceWidth), (0,TerminalWidth/2), layer=layer))    
+    if Tshape:
+        terminal.add(gds.Rectangle((-SpaceWidth,-LineWidth/2-SpaceWidth), (0,-TerminalWidth/2), layer=layer))
+    if not Galvanic:
+        terminal.add(gds.Rectangle((LineWidth,-LineWidth/2-SpaceWidth), (LineWidth+SpaceWidth,TerminalWidth/2), layer=layer))
+        if Tshape:
+            terminal.add(gds.Rectangle((LineWidth,-TerminalWidth/2), (LineWidth+SpaceWidth,-LineWidth/2-SpaceWidth), layer=layer))
+        if not Tshape:
+            terminal.add(gds.Rectangle((0,-LineWidth/2-SpaceWidth), (LineWidth,-LineWidth/2), layer=layer))
+        
+    # Antenna completely insulated from ground plane
+    # terminal.add(gds.FlexPath([(0,-LineWidth/2),(0,-LineWidth/2-TerminalWidth/2),(LineWidth+SpaceWidth,-LineWidth/2-TerminalWidth/2),
+    #                             (LineWidth+SpaceWidth,LineWidth/2+TerminalWidth/2),(0,LineWidth/2+TerminalWidth/2),(0,LineWidth/2)], 
+    #                                   SpaceWidth, ends= 'flush', corners="circular bend", bend_radius=0.6*SpaceWidth, layer=layer))
+    
+    return terminal
+
+@memoize_cell
+@instrument_cell
 def DrawBiasLine (  BiaslineCellName = 'Biasline',
                     BiaslineLength = 600,
                     LineWidth = 5,                #Width of bias line
@@ -482,7 +667,7 @@ def DrawBiasLine (  BiaslineCellName = 'Biasline',
     mainline = gds.Cell(BiaslineCellName+'Mainline', exclude_from_current=True)
     VerticalDistance = np.sign(Rotation)*15*LineWidth      #Distance from terminal to lancher (perpendicular to launcher)
     radius= abs(VerticalDistance*(2/3))
-    mainline_path=gds.FlexPath([(0,0),(BiaslineLength-radius,0)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth, layer=layer)
+    mainline_path=gds.FlexPath([(0,0),(BiaslineLength-radius,0)], [SpaceWidth, SpaceWidth], SpaceWidth + LineWidth, layer=layer, tolerance=Precision['tolerance'])
     if Rotation!=0: #L-shaped bias line
         mainline_path.turn(radius, SuppFun.Rotation2Letter(Rotation))
         mainline_path.segment((0,np.sign(Rotation)*0.5*radius), relative=True)
@@ -490,23 +675,13 @@ def DrawBiasLine (  BiaslineCellName = 'Biasline',
     
     
     '''terminal'''
-    terminal = gds.Cell(BiaslineCellName+'Terminal', exclude_from_current=True)
-    
-    #Antenna connected to ground plane
-    terminal.add(gds.Rectangle((-SpaceWidth,LineWidth/2+SpaceWidth), (0,TerminalWidth/2), layer=layer))    
-    if Tshape:
-        terminal.add(gds.Rectangle((-SpaceWidth,-LineWidth/2-SpaceWidth), (0,-TerminalWidth/2), layer=layer))
-    if not Galvanic:
-        terminal.add(gds.Rectangle((LineWidth,-LineWidth/2-SpaceWidth), (LineWidth+SpaceWidth,TerminalWidth/2), layer=layer))
-        if Tshape:
-            terminal.add(gds.Rectangle((LineWidth,-TerminalWidth/2), (LineWidth+SpaceWidth,-LineWidth/2-SpaceWidth), layer=layer))
-        if not Tshape:
-            terminal.add(gds.Rectangle((0,-LineWidth/2-SpaceWidth), (LineWidth,-LineWidth/2), layer=layer))
-        
-    # Antenna completely insulated from ground plane
-    # terminal.add(gds.FlexPath([(0,-LineWidth/2),(0,-LineWidth/2-TerminalWidth/2),(LineWidth+SpaceWidth,-LineWidth/2-TerminalWidth/2),
-    #                             (LineWidth+SpaceWidth,LineWidth/2+TerminalWidth/2),(0,LineWidth/2+TerminalWidth/2),(0,LineWidth/2)], 
-    #                                   SpaceWidth, ends= 'flush', corners="circular bend", bend_radius=0.6*SpaceWidth, layer=layer))
+    terminal = DrawBiasTerminal(TerminalCellName = BiaslineCellName+'Terminal',
+                    LineWidth = LineWidth,
+                    SpaceWidth = SpaceWidth,
+                    Tshape = Tshape,
+                    Galvanic = Galvanic,
+                    TerminalWidth = TerminalWidth,
+                    layer = layer)
     
     #Adds cell references to main cell
     Biasline = gds.Cell(BiaslineCellName, exclude_from_current=True)
@@ -514,4 +689,24 @@ def DrawBiasLine (  BiaslineCellName = 'Biasline',
     Biasline.add(gds.CellReference(mainline, origin=(-BiaslineLength,-VerticalDistance+LineWidth)))
     Biasline.add(gds.CellReference(terminal, origin=(0,LineWidth), rotation = Rotation))
 
-    return [Biasline]
\ No newline at end of file
+    return [Biasline]
+
+@memoize_cell
+@instrument_cell
+def DrawLabel (     LabelCellName = 'Label',
+                    Text = 'LABEL',               #Text, lines separated by '\n'
+                    Size = 100,                   #Character height
+                    Margin = 50,                  #Spacing between the text and the frame
+                    layer = 2):
+    """
+    This function returns a label cell (in a list) with a frame around the text minus the text itself,
+    to be subtracted from the wafer together with the circuit (the letters are then left as evaporated metal).
+    The cell origin is defined at the text position (bottom-left of the first line).
+    """
+    Text = gds.Text(Text, size=Size, position=(0,0))
+    box = Text.get_bounding_box()
+    frame = gds.Rectangle(tuple(box[0]-[Margin,Margin]), tuple(box[1]+[Margin,Margin]))
+    Label = gds.Cell(LabelCellName, exclude_from_current=True)
+    Label.add(gds.boolean(frame, Text, 'not', layer=layer))
+    
+    return [Label]
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+"""
+Benchmark suite for the qbdraw generators, the negative boolean, the GDS export and the FFSolvers writers.
+Run from the repository root:
+    python benchmarks/bench_qbdraw.py --output bench.json
+    python benchmarks/bench_qbdraw.py --output bench.json --baseline benchmarks/baseline.json
+Every benchmark records the best wall time of a few repeats, the same time relative to the 'Reference' benchmark of
+the same run (a fixed gdspy boolean, always run), the peak (python) memory of one more run and the polygon/vertex
+counts of its result. With --baseline the run fails (exit code 1) if the polygon or vertex count of a benchmark differs
+from the stored one: the counts are deterministic, so they are compared on any machine. Benchmarks whose relative time
+grew by more than --tolerance are reported as slower, and only fail the run with --fail-on-slowdown: relative times
+absorb most of the differences between machines, but not all of them. benchmarks/baseline.json is the committed
+baseline; a new one is stored by running with --output pointing to it.
+The example chip is the one of Example/FluxQubitsTest.ipynb; its scaled-up variants repeat it on a square grid of
+blocks (4x, 16x and 64x the qubits).
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import gdspy as gds
+import numpy as np
+from QubitDrawing import qbdraw, FFSolvers, CellCache, Negative
+from QubitDrawing import SuppFunctions as SuppFun
+
+def BuildExampleChip(Scale = 1):
+    '''Top cell and negative elements of the example chip, repeated on a sqrt(Scale) x sqrt(Scale) grid of blocks.'''
+    side = int(round(np.sqrt(Scale)))
+    ChipSize = [5000*side, 5000*side]
+    JJarea = 0.09**2
+    JJRelations = [1,1,1,np.sqrt(0.365)]
+    JJparameters = {'FingerWidth': np.sqrt(JJarea), 'FingerLength': 1, 'TaperWidth': 0.45, 'BridgeWidth': np.sqrt(JJarea)}
+    FourJJloopLength, CapcitorWidth, CapacitorLength = 10, 100, 500
+    FeedlineLength, FeedlineWidth, SpaceWidth, eBeamWidth = 3750, 10, 5, 2
+    QubitSpacing = 4*SpaceWidth
+    Elongations = [220.71794167942616,208.2762043523108,196.63715975597705,185.7255554469142,175.47526048991568,165.8279240597995,156.73186399711855,148.14114060458647]
+    Rotates = [False,True,False,True,False,True,False,True]
+    BiaslineLength, BiasDistance, BiasAsymmetry = 300, FourJJloopLength/2+QubitSpacing, -FourJJloopLength/2-1
+    FeedlinePos, QubitDistance = 250, 1350
+
+    Top = gds.Cell('TOP', exclude_from_current=True)
+    elements = []
+    Feedline = qbdraw.DrawReflectionFeedline(FeedlineCellName='ReflectionFeedline', MainlineLength=FeedlineLength, LineWidth=FeedlineWidth, SpaceWidth=SpaceWidth)
+    for block in range(side*side):
+        offset = np.array([(block%side-(side-1)/2)*5000, (block//side-(side-1)/2)*5000])
+        x_Origins = np.linspace(-1300,1400,len(Rotates))+offset[0]
+        y = FeedlinePos+offset[1]
+        references = [gds.CellReference(Feedline[0], origin=(offset[0], y))]
+        for i in range(len(Rotates)):
+            name = '_'+str(block)+'_'+str(i)
+            Resonator = qbdraw.DrawResonator(ResonatorCellName='Resonator'+name, LineWidth=FeedlineWidth, SpaceWidth=SpaceWidth, num_meanders=5, elongation=Elongations[i])
+            if Rotates[i]:
+                references.append(gds.CellReference(Resonator[0], origin=(x_Origins[i], y+SpaceWidth/2), rotation=180))
+                Qubit = qbdraw.DrawFourJJqubit('4JJqubit'+name, Spacing=QubitSpacing, JJRelations=JJRelations, JJparameters=JJparameters,
+                                               RectangleWidth=CapcitorWidth, FourJJloopLength=FourJJloopLength, LineWidth=eBeamWidth/2)
+                Top.add(gds.CellReference(Qubit[0], origin=(x_Origins[i]-Qubit[2][0], y+QubitDistance-Qubit[2][1]), rotation=180))
+                references.append(gds.CellReference(Qubit[1], origin=(x_Origins[i], y+QubitDistance), rotation=180))
+                Biasline = qbdraw.DrawBiasLine(BiaslineCellName='Biasline'+name, BiaslineLength=BiaslineLength, LineWidth=2, SpaceWidth=1,
+                                               TerminalWidth=10, Tshape=False, Rotation=-90, Galvanic=True)
+                references.append(gds.CellReference(Biasline[0], origin=(x_Origins[i]+45+BiasDistance, y+QubitDistance-BiasAsymmetry), rotation=-90))
+            else:
+                references.append(gds.CellReference(Resonator[0], origin=(x_Origins[i], y-SpaceWidth/2)))
+                Qubit = qbdraw.DrawFourJJgroundedQubit('4JJqubit'+name, Spacing=QubitSpacing, JJRelations=JJRelations, JJparameters=JJparameters,
+                                                       RectangleWidth=CapcitorWidth, RectangleLength=CapacitorLength, FourJJloopLength=FourJJloopLength, LineWidth=eBeamWidth/2)
+                origin = (x_Origins[i], y-QubitDistance-(CapacitorLength-CapcitorWidth))
+                Top.add(gds.CellReference(Qubit[0], origin=origin))
+                references.append(gds.CellReference(Qubit[1], origin=origin))
+                Biasline = qbdraw.DrawBiasLine(BiaslineCellName='Biasline'+name, BiaslineLength=BiaslineLength, LineWidth=2, SpaceWidth=1,
+                                               TerminalWidth=10, Tshape=False, Galvanic=True)
+                references.append(gds.CellReference(Biasline[0], origin=(x_Origins[i]-BiasAsymmetry/2, origin[1]-FourJJloopLength), rotation=90))
+        for reference in references:
+            Top.add(reference)
+        elements += references
+    crmk, mkar = qbdraw.CreateMarks(dx=ChipSize[0]-300, dy=ChipSize[1]-300)
+    Top.add(mkar)
+    return Top, elements, ChipSize
+
+def Measure(function, repeats = 3):
+    '''Best wall time [s] of the repeats, peak traced memory [MB] of one more run and the last result.'''
+    times = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter()-start)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak/2**20, result
+
+def Counts(result):
+    '''Total polygons and vertices of the cells (or polygon sets) in a result.'''
+    items = result if isinstance(result, (list, tuple)) else [result]
+    items = [item for item in items if hasattr(item, 'get_polygons') or hasattr(item, 'polygons')]
+    statistics = SuppFun.PolygonStatistics(items) if items else {}
+    return sum(s[0] for s in statistics.values()), sum(s[1] for s in statistics.values())
+
+def WriteSolverInput(writer, Name, polygons):
+    '''Writes the solver input file of the polygons, removes it and returns the written polygons.'''
+    os.remove(writer(Name, polygons))
+    return gds.PolygonSet(polygons)
+
+def Reference():
+    '''Fixed workload (union of overlapping circles) whose time is the unit of the relative times.'''
+    circles = [gds.Round(((7*i)%100, (13*i)%100), 10, number_of_points=64) for i in range(200)]
+    return gds.boolean(circles, None, 'or')
+
+def Benchmarks(Scales, Directory, BooleanScales = (1, 4)):
+    '''Dictionary {benchmark name: function without arguments}. The example chips are only built when a benchmark needs them.'''
+    uncached = lambda function, **parameters: (lambda: function.__wrapped__(**parameters))
+    benchmarks = {'Reference': Reference}
+    for meanders in (1, 5, 20):
+        benchmarks['DrawResonator_meanders'+str(meanders)] = uncached(qbdraw.DrawResonator, num_meanders=meanders, elongation=200)
+    benchmarks['DrawLauncher'] = uncached(qbdraw.DrawLauncher)
+    benchmarks['DrawJosephsonJunction'] = uncached(qbdraw.DrawJosephsonJunction)
+    for width in (100, 300):
+        benchmarks['DrawFourJJqubit_width'+str(width)] = uncached(qbdraw.DrawFourJJqubit, RectangleWidth=width)
+        benchmarks['DrawFourJJgroundedQubit_length'+str(width)] = uncached(qbdraw.DrawFourJJgroundedQubit, RectangleLength=width)
+    for rotation in (0, 90):
+        benchmarks['DrawBiasLine_rotation'+str(rotation)] = uncached(qbdraw.DrawBiasLine, Rotation=rotation)
+
+    chips = {}
+    def chip(scale):
+        '''(Top, elements, ChipSize, wafer) of a scale, built at the first call.'''
+        if scale not in chips:
+            Top, elements, ChipSize = BuildExampleChip(scale)
+            wafer = gds.Rectangle((-ChipSize[0]/2, -ChipSize[1]/2), (ChipSize[0]/2, ChipSize[1]/2), layer=0)
+            chips[scale] = (Top, elements, ChipSize, wafer)
+        return chips[scale]
+    for scale in Scales:
+        def build(scale=scale):
+            CellCache.cache_clear()
+            return BuildExampleChip(scale)[0]
+        benchmarks['ExampleChip_x'+str(scale)] = build
+        if scale in BooleanScales: #The untiled reference takes tens of minutes from 16x on
+            benchmarks['NegativeBoolean_x'+str(scale)] = lambda scale=scale: gds.boolean(chip(scale)[3], chip(scale)[1], 'not')
+        benchmarks['NegativeTiled_x'+str(scale)] = lambda scale=scale: \
+            Negative.DrawNegative(chip(scale)[1], chip(scale)[2], Tiles=(4*int(np.sqrt(scale)),)*2)
+        benchmarks['saveCell2GDS_x'+str(scale)] = lambda scale=scale: \
+            qbdraw.saveCell2GDS(chip(scale)[0], os.path.join(Directory, 'chip_x'+str(scale))) and chip(scale)[0]
+
+    polygons = []
+    def SolverPolygons():
+        '''Circuit polygons of the example chip, computed at the first call.'''
+        if not polygons:
+            polygons.extend(p for polygonsList in SuppFun.PolygonsByLayer(chip(1)[1], [2]).values() for p in polygonsList)
+        return polygons
+    benchmarks['FastHenry'] = lambda: WriteSolverInput(FFSolvers.FastHenry, os.path.join(Directory, 'FastHenry'), SolverPolygons())
+    benchmarks['FasterCap'] = lambda: WriteSolverInput(FFSolvers.FasterCap, os.path.join(Directory, 'Cap'), SolverPolygons())
+    benchmarks['FasterCap2D'] = lambda: WriteSolverInput(FFSolvers.FasterCap2D, os.path.join(Directory, 'Cap'), SolverPolygons())
+    return benchmarks
+
+def Compare(results, baseline, tolerance, MinimalDifference = 1e-3):
+    """
+    Lists of the benchmarks whose counts differ from the baseline, as (name, polygons, vertices, baseline polygons,
+    baseline vertices), and of the benchmarks whose relative time is more than (1+tolerance) times the baseline one
+    (and longer than the baseline relative time in this run's Reference units by more than MinimalDifference [s]), as (name, relative time, baseline relative time).
+    """
+    changed, slower = [], []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        stored = baseline[name]
+        if (result['polygons'], result['vertices']) != (stored['polygons'], stored['vertices']):
+            changed.append((name, result['polygons'], result['vertices'], stored['polygons'], stored['vertices']))
+        expected = stored.get('relative_time', float('inf'))*results['Reference']['time'] # [s], baseline time on this machine
+        if result['relative_time'] > (1+tolerance)*stored.get('relative_time', float('inf')) and result['time'] > expected+MinimalDifference:
+            slower.append((name, result['relative_time'], stored['relative_time']))
+    return changed, slower
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the QubitDrawing package.')
+    parser.add_argument('--output', default='bench.json', help='JSON file for the results')
+    parser.add_argument('--baseline', help='JSON file with stored results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed growth of the relative times with respect to the baseline')
+    parser.add_argument('--min-difference', type=float, default=1e-3, help='[s], slow-downs smaller than this are not reported')
+    parser.add_argument('--fail-on-slowdown', action='store_true', help='also fail the run if a relative time grew beyond --tolerance')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 4, 16, 64], help='example chip scales (perfect squares)')
+    parser.add_argument('--boolean-scales', type=int, nargs='+', default=[1, 4], help='scales of the untiled negative boolean reference')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this text')
+    arguments = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, function in Benchmarks(arguments.scales, directory, arguments.boolean_scales).items():
+            if arguments.filter not in name and name != 'Reference':
+                continue
+            wall, memory, result = Measure(function, arguments.repeats)
+            polygons, vertices = Counts(result)
+            relative = wall/results['Reference']['time'] if results else 1.0
+            results[name] = {'time': wall, 'relative_time': relative, 'peak_memory_MB': memory, 'polygons': polygons, 'vertices': vertices}
+            print('%-36s %10.4f s %10.4g x %10.2f MB %9d polygons %10d vertices' % (name, wall, relative, memory, polygons, vertices))
+    with open(arguments.output, 'w') as file:
+        json.dump(results, file, indent=1)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            changed, slower = Compare(results, json.load(file), arguments.tolerance, arguments.min_difference)
+        for name, polygons, vertices, StoredPolygons, StoredVertices in changed:
+            print('REGRESSION %s: %d polygons, %d vertices (baseline %d, %d)' % (name, polygons, vertices, StoredPolygons, StoredVertices))
+        for name, relative, reference in slower:
+            print('SLOWER %s: %.4g x Reference (baseline %.4g x)' % (name, relative, reference))
+        if changed or (slower and arguments.fail_on_slowdown):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import os
+import sys
+
+"""Stand-in for the fasthenry and FasterCap executables in the tests: python stub_solver.py [-b] InputFile.
+With -b (FasterCap batch mode) it prints a FasterCap-style capacitance matrix, otherwise it writes a FastHenry Zc.mat
+in the current directory. The values are the constants below; a missing input file exits with code 1."""
+
+Frequencies = [1e9, 5e9]
+Impedances = [[[complex(0.001, 0.0628), complex(0.0005, 0.01)], [complex(0.0005, 0.01), complex(0.002, 0.0942)]],
+              [[complex(0.0011, 0.314), complex(0.0006, 0.05)], [complex(0.0006, 0.05), complex(0.0021, 0.471)]]]
+Capacitances = [[1.25e-13, -2.5e-14], [-2.5e-14, 9.75e-14]]
+Names = ['Polygon1', 'Polygon2']
+
+def WriteZcMat(FileName):
+    with open(FileName, 'w') as file:
+        for frequency, matrix in zip(Frequencies, Impedances):
+            file.write('Impedance matrix for frequency = %g %d x %d\n' % (frequency, len(matrix), len(matrix)))
+            for row in matrix:
+                file.write(''.join('  %.6e %+.6ej' % (value.real, value.imag) for value in row)+'\n')
+
+def PrintFasterCap():
+    print('Running FasterCap (stub)')
+    print('Capacitance matrix is:')
+    print('Dimension %d x %d' % (len(Capacitances), len(Capacitances)))
+    for i, (name, row) in enumerate(zip(Names, Capacitances)):
+        print('g%d_%s  %s' % (i+1, name, '  '.join('%g' % value for value in row)))
+
+def main(arguments):
+    if not arguments or not os.path.exists(arguments[-1]):
+        print('Cannot open the input file', file=sys.stderr)
+        return 1
+    if '-b' in arguments:
+        PrintFasterCap()
+    else:
+        WriteZcMat('Zc.mat')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import io
+import gdspy
+import pytest
+from QubitDrawing import Backend
+
+"""Conformance of the gdstk backend with gdspy (Backend.CheckConformance), skipped if gdstk is not installed."""
+
+pytestmark = pytest.mark.skipif('gdstk' not in Backend.available_backends(), reason='gdstk is not installed')
+
+def test_backends_conform():
+    assert Backend.CheckConformance() == []
+
+def test_backend_restored():
+    previous = Backend.get_backend()
+    Backend.CheckConformance()
+    assert Backend.get_backend() == previous
+
+def test_writer_labels_and_file_object():
+    cell = gdspy.Cell('LabelCell', exclude_from_current=True)
+    cell.add(gdspy.Rectangle((0, 0), (10, 5), layer=2))
+    cell.add([gdspy.Label('Q'+anchor, (1, 2), anchor) for anchor in ('nw', 'n', 'ne', 'w', 'o', 'e', 'sw', 's', 'se')])
+    previous = Backend.set_backend('gdstk')
+    try:
+        outfile = io.BytesIO()
+        writer = Backend.gds.GdsWriter(outfile, unit=1e-6, precision=1e-9)
+        writer.write_cell(cell)
+        writer.close()
+    finally:
+        Backend.set_backend(previous)
+    outfile.seek(0)
+    library = gdspy.GdsLibrary(infile=outfile)
+    read = library.cells['LabelCell']
+    assert sorted((label.text, label.anchor) for label in read.labels) == sorted((label.text, label.anchor) for label in cell.labels)
+    assert read.area() == pytest.approx(50)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: Quantico
+"""
+
+import os
+import sys
+import numpy as np
+import pytest
+from QubitDrawing import SolverRunner
+import stub_solver
+
+"""SolverRunner with the stub solver (stub_solver.py run by this python) instead of fasthenry and FasterCap."""
+
+Stub = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_solver.py')
+
+@pytest.fixture
+def StubSolvers(monkeypatch):
+    monkeypatch.setitem(SolverRunner.SolverExecutables, 'FastHenry', sys.executable)
+    monkeypatch.setitem(SolverRunner.SolverExecutables, 'FasterCap', sys.executable)
+    monkeypatch.setitem(SolverRunner.SolverArguments, 'FastHenry', [Stub])
+    monkeypatch.setitem(SolverRunner.SolverArguments, 'FasterCap', [Stub, '-b'])
+
+def WriteInput(directory, name):
+    InputFile = os.path.join(str(directory), name)
+    with open(InputFile, 'w') as file:
+        file.write('* input\n')
+    return InputFile
+
+def test_run_solver_jobs(StubSolvers, tmp_path):
+    jobs = [SolverRunner.SolverJob('FastHenry', WriteInput(tmp_path, 'henry.inp')),
+            SolverRunner.SolverJob('FasterCap', WriteInput(tmp_path, 'cap.txt')),
+            SolverRunner.SolverJob('FastHenry', WriteInput(tmp_path, 'henry2.inp'))]
+    results = SolverRunner.RunSolverJobs(jobs, MaxWorkers=2)
+    assert [result['error'] for result in results] == [None, None, None]
+    for result in (results[0], results[2]):
+        assert result['returncode'] == 0
+        np.testing.assert_allclose(result['frequencies'], stub_solver.Frequencies)
+        assert len(result['matrices']) == len(stub_solver.Impedances)
+        for matrix, expected in zip(result['matrices'], stub_solver.Impedances):
+            np.testing.assert_allclose(matrix, np.array(expected), rtol=1e-6)
+    np.testing.assert_allclose(results[1]['matrix'], stub_solver.Capacitances)
+    assert results[1]['names'] == stub_solver.Names
+
+def test_parsers(tmp_path):
+    ZcMat = str(tmp_path/'Zc.mat')
+    stub_solver.WriteZcMat(ZcMat)
+    frequencies, matrices = SolverRunner.ParseZcMat(ZcMat)
+    np.testing.assert_allclose(frequencies, stub_solver.Frequencies)
+    np.testing.assert_allclose(matrices[1], np.array(stub_solver.Impedances[1]), rtol=1e-6)
+    assert SolverRunner.ParseFasterCapOutput('no matrix here') == [None, []]
+
+def test_failed_job(StubSolvers, tmp_path):
+    result = SolverRunner.RunSolverJob(SolverRunner.SolverJob('FastHenry', str(tmp_path/'missing.inp')))
+    assert result['returncode'] == 1
+    assert result['error'] == 'Exit code 1'
+    assert 'matrices' not in result
+
+def test_missing_executable(tmp_path):
+    job = SolverRunner.SolverJob('FasterCap', WriteInput(tmp_path, 'cap.txt'), Executable=str(tmp_path/'no_solver'))
+    assert SolverRunner.RunSolverJob(job)['error'] is not None